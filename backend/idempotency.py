@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# How long the reply to a request with an idempotency key is kept for retries of it
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# Longest a worker waits on a keyed request another worker process is running before running it itself
+IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "30"))
+IDEMPOTENCY_POLL = 0.01
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was sent again with a different request"""
+
+
+class NotApplied(Exception):
+    """Raised by a keyed call that certainly changed nothing; `reply` answers it but is not kept"""
+
+    def __init__(self, reply: Any):
+        super().__init__()
+        self.reply = reply
+
+
+class IdempotencyStore:
+    """Replies to requests sent with an idempotency key, replayed when the request is retried.
+
+    The first request with a key runs `call`. A retry arriving while it is
+    still running waits for the same reply, and one arriving within `ttl`
+    seconds gets the stored reply, so the work is done once either way. A
+    waiter going away does not cancel the call. A call that raises, or
+    raises NotApplied to answer with a reply, stores nothing: a later retry
+    runs it again. Keys are remembered with the
+    request they came with (`fingerprint`); reusing a key for another
+    request raises IdempotencyConflict. Entries past `max_entries` are
+    dropped least recently used first.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._replies: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    async def run(
+        self, key: str, fingerprint: str, call: Callable[[], Awaitable[Any]], decode: Optional[Callable] = None
+    ) -> Any:
+        """Reply for a keyed request; `decode` is for SharedIdempotencyStore"""
+        stored = await self._load(key, decode)
+        if stored is not None:
+            return self._replay(fingerprint, *stored)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(fingerprint, inflight[0])
+            self.replayed += 1
+            return await self._wait(inflight[1])
+
+        future = asyncio.ensure_future(self._execute(key, fingerprint, call, decode))
+        self._inflight[key] = (fingerprint, future)
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return await self._wait(future)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = len(self._replies)
+        return {
+            "entries": entries,
+            "inflight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
+
+    async def _execute(self, key: str, fingerprint: str, call: Callable[[], Awaitable[Any]], decode: Optional[Callable]) -> Any:
+        self.executed += 1
+        reply = await call()
+        await self._save(key, fingerprint, reply)
+        return reply
+
+    async def _wait(self, future: asyncio.Future) -> Any:
+        try:
+            return await asyncio.shield(future)
+        except NotApplied as e:
+            return e.reply
+
+    def _replay(self, fingerprint: str, used_for: str, reply: Any) -> Any:
+        self._check(fingerprint, used_for)
+        self.replayed += 1
+        return reply
+
+    def _check(self, fingerprint: str, used_for: str) -> None:
+        if fingerprint != used_for:
+            self.conflicts += 1
+            raise IdempotencyConflict()
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            future.exception()
+
+    async def _load(self, key: str, decode: Optional[Callable]) -> Optional[Tuple[str, Any]]:
+        """(fingerprint, reply) stored for a key, or None"""
+        with self._lock:
+            entry = self._replies.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._replies[key]
+                return None
+            return entry[1], entry[2]
+
+    async def _save(self, key: str, fingerprint: str, reply: Any) -> None:
+        with self._lock:
+            self._replies[key] = (time.monotonic() + self.ttl, fingerprint, reply)
+            self._replies.move_to_end(key)
+            while len(self._replies) > self.max_entries:
+                self._replies.popitem(last=False)
+
+
+class SharedIdempotencyStore(IdempotencyStore):
+    """IdempotencyStore whose replies are shared by worker processes through a `SharedStore`.
+
+    Replies are stored as JSON (they must be serializable) and come back
+    through `decode` when given, e.g. named tuples come back as lists. The
+    worker that runs a keyed request first takes a lease on its key; a retry
+    reaching another worker meanwhile polls for the reply instead of running
+    the request again. If the lease holder disappears without a reply, the
+    waiter runs the request once the lease expires.
+    """
+
+    def __init__(
+        self,
+        store,
+        ttl: float = IDEMPOTENCY_TTL,
+        lease: float = IDEMPOTENCY_LEASE,
+        poll_interval: float = IDEMPOTENCY_POLL,
+    ):
+        super().__init__(ttl)
+        self.store = store
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+    async def _execute(self, key: str, fingerprint: str, call: Callable[[], Awaitable[Any]], decode: Optional[Callable]) -> Any:
+        deadline = time.monotonic() + self.lease
+        while True:
+            stored = await self._load(key, decode)
+            if stored is not None:
+                return self._replay(fingerprint, *stored)
+            if await self.store.aadd(f"idempotency:{key}:lease", b"1", self.lease):
+                try:
+                    return await super()._execute(key, fingerprint, call, decode)
+                finally:
+                    await self.store.adelete(f"idempotency:{key}:lease")
+            if time.monotonic() > deadline:
+                return await super()._execute(key, fingerprint, call, decode)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _load(self, key: str, decode: Optional[Callable]) -> Optional[Tuple[str, Any]]:
+        blob = await self.store.aget(f"idempotency:{key}")
+        if blob is None:
+            return None
+        stored = json.loads(blob)
+        reply = stored["reply"]
+        return stored["fingerprint"], decode(reply) if decode is not None and reply is not None else reply
+
+    async def _save(self, key: str, fingerprint: str, reply: Any) -> None:
+        await self.store.aset(f"idempotency:{key}", json.dumps({"fingerprint": fingerprint, "reply": reply}).encode(), self.ttl)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        # Replies live in the shared store, not in this worker
+        del stats["entries"]
+        return stats
@@ -1,12 +1,76 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import requests
+import asyncio
 import re
-from typing import Optional, List, Dict
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Optional, List, Dict, Tuple
 import os
 from dotenv import load_dotenv
-app = FastAPI()
+
+# Before the backend and engine imports: their modules read settings from the environment when imported
+load_dotenv()
+
+from backend.metrics import (  # noqa: E402
+    CHAT_INTENTS,
+    CHAT_REQUEST_SECONDS,
+    CHAT_SOCKET_CONNECTIONS,
+    CHAT_SOCKET_MESSAGES,
+    CHAT_STAGE_SECONDS,
+    RequestStats,
+    current_request,
+    gauge_lines,
+    registry,
+)
+from backend.idempotency import IdempotencyConflict, IdempotencyStore, NotApplied, SharedIdempotencyStore  # noqa: E402
+from backend.profiling import PROFILING_ENABLED, profile_request  # noqa: E402
+from backend.upstream import OneListClient, write_not_applied  # noqa: E402
+from backend.write_behind import LOCAL_ID_PREFIX, WRITE_BEHIND_ENABLED, WriteBehindStore, WriteJournal  # noqa: E402
+from engine.chat import ChatEngine, Reply, describe_error  # noqa: E402
+from engine.intents import MAX_MESSAGE_LENGTH, identify_intent, intent_matcher  # noqa: E402
+from engine.rate_limit import (  # noqa: E402
+    CHAT_RATE_BURST,
+    CHAT_RATE_LIMIT,
+    UPSTREAM_BUDGET,
+    UPSTREAM_BUDGET_BURST,
+    RateLimited,
+    make_limiter,
+)
+from engine.sessions import SessionStore, SharedSessionStore  # noqa: E402
+from engine.shared_state import open_shared_store  # noqa: E402
+from engine.singleflight import SharedSingleFlight, SingleFlight  # noqa: E402
+from engine.task_cache import SharedTaskCache, TaskCache  # noqa: E402
+from engine.task_sync import TASK_SYNC_INTERVAL, TaskSync  # noqa: E402
+from engine.task_views import LIST_INTENTS, render_list  # noqa: E402
+from engine.tasks import Task  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the connection pool and intent patterns before the first request instead of during it
+    await client.open()
+    intent_matcher.compile()
+    if write_behind is not None:
+        write_behind.start()
+    if task_sync is not None:
+        task_sync.start()
+    yield
+    if task_sync is not None:
+        await task_sync.stop()
+    if write_behind is not None:
+        await write_behind.stop()
+    await client.close()
+    if shared_store is not None:
+        await shared_store.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+if PROFILING_ENABLED:
+    # Opt-in per request with an "X-Profile: 1" header; only installed when enabled
+    app.middleware("http")(profile_request)
 
 # CORS middleware for Streamlit
 app.add_middleware(
@@ -16,94 +80,363 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-load_dotenv() 
+
 # Configuration
-API_BASE_URL = "https://one-list-api.herokuapp.com"
+API_BASE_URL = os.getenv("ONE_LIST_API_URL", "https://one-list-api.herokuapp.com")
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN", "")
 print(ACCESS_TOKEN)
+
+# Shared pooled client for every upstream call
+client = OneListClient(API_BASE_URL)
+# With SHARED_STATE_URL set, worker processes share the task cache, sessions and in-flight reads
+shared_store = open_shared_store()
+# Concurrent identical upstream reads share one request
+upstream_flights = SingleFlight() if shared_store is None else SharedSingleFlight(shared_store)
+# Per-token limits on chat messages and on the upstream reads they cause (off unless configured)
+chat_limiter = make_limiter("chat", CHAT_RATE_LIMIT, CHAT_RATE_BURST, shared_store)
+upstream_budget = make_limiter("upstream", UPSTREAM_BUDGET, UPSTREAM_BUDGET_BURST, shared_store)
+
+def on_write_synced(token: str, op: Dict, task: Optional[Task]) -> None:
+    if op["op"] == "add":
+        # Writes queued after the add now refer to the real id; keep showing their effect
+        task = write_behind.overlay_task(token, task)
+        if task is not None:
+            engine.task_cache.replace_task(token, f"{LOCAL_ID_PREFIX}{op['seq']}", task)
+
+def on_write_dropped(token: str, op: Dict) -> None:
+    # The local view assumed the write would land; refetch to undo it
+    engine.task_cache.invalidate(token)
+
+# With WRITE_BEHIND=1, add/complete/delete reply from the local journal and sync in the background
+write_behind = WriteBehindStore(client, WriteJournal(), on_write_synced, on_write_dropped) if WRITE_BEHIND_ENABLED else None
+
+# With TASK_SYNC_INTERVAL set, active tokens' lists are refreshed in the background and reads served from them
+task_sync = TaskSync(lambda token: engine.sync_tasks(token)) if TASK_SYNC_INTERVAL > 0 else None
+
+# Replies to writes sent with an idempotency key, replayed to retries of the same request
+idempotency = IdempotencyStore() if shared_store is None else SharedIdempotencyStore(shared_store)
+
+# Intent handlers, the per-token task cache and per-session state (paging cursors)
+engine = ChatEngine(
+    client,
+    task_cache=TaskCache() if shared_store is None else SharedTaskCache(shared_store),
+    sessions=SessionStore() if shared_store is None else SharedSessionStore(shared_store),
+    flights=upstream_flights,
+    write_behind=write_behind,
+    upstream_budget=upstream_budget,
+    task_sync=task_sync,
+    stage_timer=CHAT_STAGE_SECONDS.time,
+)
+
 class ChatRequest(BaseModel):
     message: str
     access_token: Optional[str] = None
+    session_id: Optional[str] = None
+    # Sending a request again with the same key replays the first reply instead of repeating a write
+    idempotency_key: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     intent: str
     success: bool
 
-# Intent identification patterns
-INTENT_PATTERNS = {
-    "add_task": [
-        r"add\s+(?:a\s+)?(?:new\s+)?task\s+(?:to\s+)?(.+)",
-        r"create\s+(?:a\s+)?(?:new\s+)?task\s+(?:to\s+)?(.+)",
-        r"new\s+task[:\s]+(.+)",
-        r"remind\s+me\s+to\s+(.+)",
-    ],
-    "list_tasks": [
-        r"(?:show|list|view|display|get)\s+(?:all\s+)?(?:my\s+)?tasks?",
-        r"what\s+(?:are\s+)?(?:my\s+)?tasks?",
-        r"show\s+me\s+(?:my\s+)?(?:all\s+)?tasks?",
-    ],
-    "list_incomplete": [
-        r"(?:show|list|view|what)\s+.*(?:incomplete|pending|unfinished|undone)",
-        r"(?:incomplete|pending|unfinished|undone)\s+tasks?",
-    ],
-    "list_complete": [
-        r"(?:show|list|view|what)\s+.*(?:complete|completed|done|finished)",
-        r"(?:complete|completed|done|finished)\s+tasks?",
-    ],
-    "view_task": [
-        r"(?:show|view|display|get)\s+task\s+(?:number\s+)?(\d+)",
-        r"task\s+(?:number\s+)?(\d+)",
-    ],
-    "complete_task": [
-        r"(?:mark|set|complete|finish)\s+(?:task\s+)?['\"]?(.+?)['\"]?\s+(?:as\s+)?(?:done|complete|completed|finished)",
-        r"(?:done|complete|finish)\s+(?:task\s+)?['\"]?(.+?)['\"]?",
-        r"complete\s+task\s+(\d+)",
-    ],
-    "delete_task": [
-        r"delete\s+(?:task\s+)?['\"]?(.+?)['\"]?",
-        r"remove\s+(?:task\s+)?['\"]?(.+?)['\"]?",
-    ],
-}
+class BatchChatRequest(BaseModel):
+    requests: Optional[List[ChatRequest]] = None
+    message: Optional[str] = None
+    access_token: Optional[str] = None
+    session_id: Optional[str] = None
+    # With `message`, clause i is sent with the key "<idempotency_key>:<i>"
+    idempotency_key: Optional[str] = None
 
-def identify_intent(message: str) -> tuple:
-    """Identify intent and extract parameters from user message"""
-    message = message.lower().strip()
-    
-    for intent, patterns in INTENT_PATTERNS.items():
-        for pattern in patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                params = match.groups() if match.groups() else None
-                return intent, params
-    
-    return "unknown", None
+# Open /ws/chat connections
+open_sockets: set = set()
 
-def get_all_tasks(token: str) -> List[Dict]:
-    """Fetch all tasks from API"""
-    try:
-        response = requests.get(
-            f"{API_BASE_URL}/items",
-            params={"access_token": token}
-        )
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch tasks: {str(e)}")
+# Intents that read the task list; a batch fetches it once per token for these
+SNAPSHOT_INTENTS = {
+    "list_tasks", "list_incomplete", "list_complete", "list_page", "list_next",
+    "complete_task", "delete_task", "complete_all", "delete_all",
+}
+# Intents that write upstream
+WRITE_INTENTS = {"add_task", "complete_task", "delete_task", "complete_all", "delete_all"}
+# Writes that pick their tasks by name or number; in a batch they see the writes queued before them
+RESOLVING_INTENTS = {"complete_task", "delete_task", "complete_all", "delete_all"}
+# Independent writes (adds) of one batch in flight at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Commands (requests or clauses) accepted in one batch
+MAX_BATCH_COMMANDS = int(os.getenv("MAX_BATCH_COMMANDS", "50"))
+# /metrics encoding of circuit breaker states
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+# Task lines sent per chunk by /chat/stream and /ws/chat
+STREAM_CHUNK_LINES = int(os.getenv("STREAM_CHUNK_LINES", "50"))
+# A /ws/chat connection with no message for this many seconds is closed; the client reconnects
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "300"))
+# Starts at the separator itself: a leading \s* would rescan every run of spaces from each of its positions
+CLAUSE_SEPARATOR = re.compile(r"([,;\n][\s,;]*(?:and\s+|then\s+)?)", re.IGNORECASE)
 
-def find_task_by_name(tasks: List[Dict], name: str) -> Optional[Dict]:
-    """Find task by name (case-insensitive partial match)"""
-    name = name.lower().strip().strip('"\'')
-    for task in tasks:
-        if name in task.get("text", "").lower():
-            return task
-    return None
+def split_clauses(message: str) -> List[str]:
+    """Split a multi-command message into one command per clause.
+
+    Fragments that are not commands on their own ("add a task to buy eggs,
+    milk") are glued back onto the previous clause.
+    """
+    parts = CLAUSE_SEPARATOR.split(message.strip())
+    # Pieces of each clause, joined once at the end rather than copied on every glued fragment
+    clauses = [[parts[0]]]
+    for separator, fragment in zip(parts[1::2], parts[2::2]):
+        if identify_intent(fragment)[0] == "unknown":
+            clauses[-1] += (separator, fragment)
+        else:
+            clauses.append([fragment])
+    joined = ("".join(pieces).strip() for pieces in clauses)
+    return [clause for clause in joined if clause]
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Process chat message and interact with One List API"""
     token = request.access_token or ACCESS_TOKEN
-    
+    limited = await rate_limited(token)
+    if limited is not None:
+        return limited
+    return await process_message(
+        request.message, token, session_id=request.session_id, idempotency_key=request.idempotency_key
+    )
+
+@app.post("/chat/batch", response_model=List[ChatResponse])
+async def chat_batch(request: BatchChatRequest):
+    """Process several commands, sharing one task snapshot per token.
+
+    Adds run concurrently, at most BATCH_CONCURRENCY at a time. Reads and
+    writes that pick tasks by name or number wait for the writes queued
+    before them on the same token, so "add eggs, mark eggs as done" finds
+    the new task. Responses keep the request order. A batch is refused
+    with 422 when it has more than MAX_BATCH_COMMANDS commands, or when
+    `message` is over MAX_MESSAGE_LENGTH (checked before it is split).
+    """
+    if request.requests is not None:
+        items = [
+            (r.message, r.access_token or request.access_token or ACCESS_TOKEN, r.session_id or request.session_id)
+            for r in request.requests
+        ]
+        keys = [r.idempotency_key for r in request.requests]
+    elif request.message:
+        if len(request.message) > MAX_MESSAGE_LENGTH:
+            raise HTTPException(
+                status_code=422,
+                detail=f"'message' is too long ({len(request.message)} characters). Please keep it under {MAX_MESSAGE_LENGTH}.",
+            )
+        token = request.access_token or ACCESS_TOKEN
+        items = [(clause, token, request.session_id) for clause in split_clauses(request.message)]
+        keys = [f"{request.idempotency_key}:{i}" if request.idempotency_key else None for i in range(len(items))]
+    else:
+        raise HTTPException(status_code=422, detail="Provide either 'requests' or 'message'.")
+    if len(items) > MAX_BATCH_COMMANDS:
+        raise HTTPException(
+            status_code=422, detail=f"A batch can hold at most {MAX_BATCH_COMMANDS} commands, got {len(items)}."
+        )
+
+    limited = [await rate_limited(token) for _, token, _ in items]
+    intents = [identify_intent(message)[0] for message, _, _ in items]
+    snapshot_tokens = {
+        token
+        for (_, token, _), intent, reply in zip(items, intents, limited)
+        if token and reply is None and intent in SNAPSHOT_INTENTS
+    }
+    fetched = await asyncio.gather(*(engine.get_all_tasks(t) for t in snapshot_tokens), return_exceptions=True)
+    snapshots = {t: tasks for t, tasks in zip(snapshot_tokens, fetched) if not isinstance(tasks, Exception)}
+
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def write(*args) -> ChatResponse:
+        async with limit:
+            return await process_message(*args)
+
+    results: List = [None] * len(items)
+    # token -> its writes still running
+    pending: Dict[Optional[str], List[asyncio.Task]] = {}
+    written = set()
+    for i, ((message, token, session_id), intent) in enumerate(zip(items, intents)):
+        if limited[i] is not None:
+            results[i] = limited[i]
+            continue
+        if intent in WRITE_INTENTS and intent not in RESOLVING_INTENTS:
+            results[i] = asyncio.create_task(write(message, token, snapshots.get(token), session_id, keys[i]))
+            pending.setdefault(token, []).append(results[i])
+            written.add(token)
+            continue
+        await asyncio.gather(*pending.pop(token, []))
+        # After a write the snapshot is stale; the write-through cache has the current list
+        snapshot = None if token in written else snapshots.get(token)
+        results[i] = await process_message(message, token, snapshot, session_id, keys[i])
+        if intent in WRITE_INTENTS:
+            written.add(token)
+    await asyncio.gather(*(task for tasks in pending.values() for task in tasks))
+    return [r.result() if isinstance(r, asyncio.Task) else r for r in results]
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Like /chat, but list replies are streamed as plain text while they are rendered.
+
+    A list already rendered for the current snapshot is sent in one piece.
+
+    The intent and success flag are sent in the X-Chat-Intent and
+    X-Chat-Success headers since the body is the bare reply text.
+    """
+    token = request.access_token or ACCESS_TOKEN
+    intent, success, chunks = await streamed_reply(request.message, token, request.session_id, request.idempotency_key)
+    return StreamingResponse(
+        chunks,
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Chat-Intent": intent, "X-Chat-Success": str(success).lower()},
+    )
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """One chat conversation over a single connection.
+
+    Each message from the client is a JSON object like a /chat request; the
+    first one's `access_token` and `session_id` (a new id if missing) hold
+    for the whole connection, so later ones only need `message`. Each reply
+    is sent as JSON frames {"text", "done": false} while a list is rendered,
+    then {"text", "intent", "success", "done": true} with the rest. The
+    session's state (paging cursor, list numbers) is dropped on disconnect
+    unless the client named the session itself.
+    """
+    await websocket.accept()
+    CHAT_SOCKET_CONNECTIONS.inc()
+    open_sockets.add(websocket)
+    token = session_id = None
+    named_session = False
+    try:
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive_text(), WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle")
+                return
+            try:
+                request = ChatRequest.model_validate_json(frame)
+            except ValidationError:
+                await websocket.send_json(
+                    {"text": "Expected a JSON object with a 'message'.", "intent": "error", "success": False, "done": True}
+                )
+                continue
+            if session_id is None:
+                token = request.access_token or ACCESS_TOKEN
+                named_session = request.session_id is not None
+                session_id = request.session_id or uuid.uuid4().hex
+            message = request.message
+            CHAT_SOCKET_MESSAGES.inc()
+            intent, success, chunks = await streamed_reply(message, token, session_id, request.idempotency_key)
+            # Hold back one chunk so the last goes out in the frame carrying the intent
+            held = None
+            async for piece in chunks:
+                if held is not None:
+                    await websocket.send_json({"text": held, "done": False})
+                held = piece
+            await websocket.send_json({"text": held or "", "intent": intent, "success": success, "done": True})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        open_sockets.discard(websocket)
+        if session_id is not None and not named_session:
+            await engine.sessions.discard(session_id)
+
+async def single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def streamed_reply(
+    message: str, token: Optional[str], session_id: Optional[str], idempotency_key: Optional[str] = None
+) -> Tuple[str, bool, AsyncIterator[str]]:
+    """(intent, success, reply chunks) for /chat/stream and /ws/chat.
+
+    List replies are rendered lazily, STREAM_CHUNK_LINES task lines per
+    chunk; anything else is a single chunk with /chat's wording.
+    """
+    limited = await rate_limited(token)
+    if limited is not None:
+        return limited.intent, False, single_chunk(limited.response)
+    start = time.perf_counter()
+    intent, _ = identify_intent(message)
+    parsed = time.perf_counter() - start
+    tasks = None
+    if token and intent in LIST_INTENTS:
+        stats = RequestStats(intent)
+        context = current_request.set(stats)
+        try:
+            tasks = await engine.get_all_tasks(token)
+        except Exception:
+            tasks = None
+        finally:
+            current_request.reset(context)
+    if tasks is None:
+        # Not a list, or the fetch failed: reply in one piece with /chat's wording (and its metrics)
+        reply = await process_message(message, token, session_id=session_id, idempotency_key=idempotency_key)
+        return reply.intent, reply.success, single_chunk(reply.response)
+
+    CHAT_STAGE_SECONDS.observe(parsed, intent, "parse")
+    CHAT_INTENTS.inc(intent)
+    CHAT_STAGE_SECONDS.observe(stats.upstream_seconds, intent, "upstream")
+    await engine.remember_list(session_id, token, intent, tasks)
+    render_key = f"render:{intent}"
+    rendered = engine.task_cache.cached_derived(token, tasks, render_key)
+    fetched = time.perf_counter() - start
+
+    # Async, so StreamingResponse runs it on the event loop rather than in its threadpool: metrics are not thread-safe
+    async def chunks() -> AsyncIterator[str]:
+        # Rendering time only, not the time the client takes to read each chunk
+        formatting = 0.0
+        resumed = time.perf_counter()
+        try:
+            if rendered is not None:
+                formatting += time.perf_counter() - resumed
+                yield rendered
+                return
+            pieces = []
+            sent = 0
+            for piece in render_list(intent, engine.get_partitions(token, tasks)[intent]):
+                pieces.append(piece)
+                if len(pieces) - sent >= STREAM_CHUNK_LINES:
+                    formatting += time.perf_counter() - resumed
+                    yield "".join(pieces[sent:])
+                    resumed = time.perf_counter()
+                    sent = len(pieces)
+            if sent < len(pieces):
+                formatting += time.perf_counter() - resumed
+                yield "".join(pieces[sent:])
+                resumed = time.perf_counter()
+            # Keep the full reply so asking again (here or on /chat) skips rendering
+            engine.task_cache.derived(token, tasks, render_key, lambda _: "".join(pieces))
+            formatting += time.perf_counter() - resumed
+        finally:
+            CHAT_STAGE_SECONDS.observe(formatting, intent, "format")
+            CHAT_REQUEST_SECONDS.observe(fetched + formatting, intent)
+
+    return intent, True, chunks()
+
+async def rate_limited(token: Optional[str]) -> Optional[ChatResponse]:
+    """Reply for a message over its token's chat rate limit, or None to go ahead"""
+    if chat_limiter is None or not token:
+        return None
+    retry_after = await chat_limiter.take(token)
+    if not retry_after:
+        return None
+    return ChatResponse(response=describe_error(RateLimited(retry_after)), intent="rate_limited", success=False)
+
+async def process_message(
+    message: str,
+    token: Optional[str],
+    snapshot: Optional[List[Task]] = None,
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> ChatResponse:
+    """Handle one chat message; see `ChatEngine.dispatch` for `snapshot` and `session_id`.
+
+    A write sent with an `idempotency_key` runs once per key and token; repeats
+    within IDEMPOTENCY_TTL get the first reply with no upstream call. A
+    failure is only kept when the write may still have reached the API (a
+    timeout or a 5xx); after one that certainly changed nothing, such as a
+    refused connection or a 4xx, a repeat runs the write again.
+    """
     if not token:
         return ChatResponse(
             response="Please configure your ACCESS_TOKEN to use this service.",
@@ -111,208 +444,50 @@ async def chat(request: ChatRequest):
             success=False
         )
     
-    intent, params = identify_intent(request.message)
-    
+    start = time.perf_counter()
+    intent, params = identify_intent(message)
+    CHAT_STAGE_SECONDS.observe(time.perf_counter() - start, intent, "parse")
+    CHAT_INTENTS.inc(intent)
+
+    stats = RequestStats(intent)
+    context = current_request.set(stats)
     try:
-        # Handle different intents
-        if intent == "add_task":
-            task_name = params[0].strip() if params else None
-            if not task_name:
-                return ChatResponse(
-                    response="Please specify a task name.",
-                    intent=intent,
-                    success=False
-                )
-            
-            response = requests.post(
-                f"{API_BASE_URL}/items",
-                params={"access_token": token},
-                json={"text": task_name}
-            )
-            response.raise_for_status()
-            task = response.json()
-            return ChatResponse(
-                response=f"✓ Task created: \"{task['text']}\"",
-                intent=intent,
-                success=True
-            )
-        
-        elif intent == "list_tasks":
-            tasks = get_all_tasks(token)
-            if not tasks:
-                return ChatResponse(
-                    response="You have no tasks.",
-                    intent=intent,
-                    success=True
-                )
-            
-            task_list = "\n".join([
-                f"{i+1}. {'✓' if t.get('complete') else '○'} {t['text']}"
-                for i, t in enumerate(tasks)
-            ])
-            return ChatResponse(
-                response=f"You have {len(tasks)} task(s):\n\n{task_list}",
-                intent=intent,
-                success=True
-            )
-        
-        elif intent == "list_incomplete":
-            tasks = get_all_tasks(token)
-            incomplete = [t for t in tasks if not t.get("complete")]
-            
-            if not incomplete:
-                return ChatResponse(
-                    response="You have no incomplete tasks. Great job!",
-                    intent=intent,
-                    success=True
-                )
-            
-            task_list = "\n".join([
-                f"{i+1}. {t['text']}"
-                for i, t in enumerate(incomplete)
-            ])
-            return ChatResponse(
-                response=f"You have {len(incomplete)} incomplete task(s):\n\n{task_list}",
-                intent=intent,
-                success=True
-            )
-        
-        elif intent == "list_complete":
-            tasks = get_all_tasks(token)
-            complete = [t for t in tasks if t.get("complete")]
-            
-            if not complete:
-                return ChatResponse(
-                    response="You have no completed tasks yet.",
-                    intent=intent,
-                    success=True
-                )
-            
-            task_list = "\n".join([
-                f"{i+1}. {t['text']}"
-                for i, t in enumerate(complete)
-            ])
-            return ChatResponse(
-                response=f"You have {len(complete)} completed task(s):\n\n{task_list}",
-                intent=intent,
-                success=True
+        if idempotency_key and intent in WRITE_INTENTS:
+            reply = await idempotency.run(
+                f"{token}:{idempotency_key}",
+                message,
+                lambda: keyed_write(intent, params, token, snapshot, session_id),
+                Reply._make,
             )
-        
-        elif intent == "view_task":
-            task_id = params[0] if params else None
-            if not task_id:
-                return ChatResponse(
-                    response="Please specify a task number.",
-                    intent=intent,
-                    success=False
-                )
-            
-            response = requests.get(
-                f"{API_BASE_URL}/items/{task_id}",
-                params={"access_token": token}
-            )
-            response.raise_for_status()
-            task = response.json()
-            
-            status = "✓ Completed" if task.get("complete") else "○ Incomplete"
-            return ChatResponse(
-                response=f"Task #{task_id}:\n\nName: {task['text']}\nStatus: {status}",
-                intent=intent,
-                success=True
-            )
-        
-        elif intent == "complete_task":
-            task_identifier = params[0].strip() if params else None
-            if not task_identifier:
-                return ChatResponse(
-                    response="Please specify which task to complete.",
-                    intent=intent,
-                    success=False
-                )
-            
-            # Check if it's a task ID (number) or name
-            if task_identifier.isdigit():
-                task_id = task_identifier
-            else:
-                # Find task by name
-                tasks = get_all_tasks(token)
-                task = find_task_by_name(tasks, task_identifier)
-                if not task:
-                    return ChatResponse(
-                        response=f"Task '{task_identifier}' not found.",
-                        intent=intent,
-                        success=False
-                    )
-                task_id = task["id"]
-            
-            response = requests.put(
-                f"{API_BASE_URL}/items/{task_id}",
-                params={"access_token": token},
-                json={"complete": True}
-            )
-            response.raise_for_status()
-            
-            return ChatResponse(
-                response=f"✓ Task marked as complete!",
-                intent=intent,
-                success=True
-            )
-        
-        elif intent == "delete_task":
-            task_identifier = params[0].strip() if params else None
-            if not task_identifier:
-                return ChatResponse(
-                    response="Please specify which task to delete.",
-                    intent=intent,
-                    success=False
-                )
-            
-            # Check if it's a task ID (number) or name
-            if task_identifier.isdigit():
-                task_id = task_identifier
-            else:
-                # Find task by name
-                tasks = get_all_tasks(token)
-                task = find_task_by_name(tasks, task_identifier)
-                if not task:
-                    return ChatResponse(
-                        response=f"Task '{task_identifier}' not found.",
-                        intent=intent,
-                        success=False
-                    )
-                task_id = task["id"]
-            
-            response = requests.delete(
-                f"{API_BASE_URL}/items/{task_id}",
-                params={"access_token": token}
-            )
-            response.raise_for_status()
-            
-            return ChatResponse(
-                response=f"✓ Task deleted successfully!",
-                intent=intent,
-                success=True
-            )
-        
         else:
-            return ChatResponse(
-                response="I'm not sure what you want to do. You can:\n\n• Add a task: 'Add a task to buy milk'\n• List tasks: 'Show all tasks'\n• View a task: 'Show task 2'\n• Complete a task: 'Mark buy milk as done'\n• Delete a task: 'Delete buy milk'",
-                intent=intent,
-                success=False
-            )
-    
-    except requests.exceptions.HTTPError as e:
+            reply = await engine.dispatch(intent, params, token, snapshot, session_id)
+        return ChatResponse(response=reply.response, intent=reply.intent, success=reply.success)
+    except IdempotencyConflict:
         return ChatResponse(
-            response=f"API Error: {e.response.status_code} - {e.response.text}",
-            intent=intent,
-            success=False
+            response="This idempotency key was already used for a different message.",
+            intent="idempotency_conflict",
+            success=False,
         )
+    finally:
+        current_request.reset(context)
+        CHAT_STAGE_SECONDS.observe(stats.upstream_seconds, intent, "upstream")
+        CHAT_REQUEST_SECONDS.observe(time.perf_counter() - start, intent)
+
+async def keyed_write(
+    intent: str, params: Optional[tuple], token: str, snapshot: Optional[List[Task]], session_id: Optional[str]
+) -> Reply:
+    """Run a write for IdempotencyStore, raising NotApplied with the reply when it certainly changed nothing"""
+    try:
+        reply = await engine.dispatch(intent, params, token, snapshot, session_id, raise_errors=True)
     except Exception as e:
-        return ChatResponse(
-            response=f"Error: {str(e)}",
-            intent=intent,
-            success=False
-        )
+        reply = Reply(describe_error(e), intent, False)
+        if write_not_applied(e):
+            raise NotApplied(reply)
+        return reply
+    if not reply.success:
+        # Turned down before writing, e.g. no task by that name
+        raise NotApplied(reply)
+    return reply
 
 @app.get("/")
 async def root():
@@ -321,3 +496,95 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return engine.task_cache.stats()
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    stats = {"singleflight": upstream_flights.stats(), **client.stats()}
+    stats["rate_limits"] = {
+        "chat": chat_limiter.stats() if chat_limiter is not None else None,
+        "upstream": upstream_budget.stats() if upstream_budget is not None else None,
+        "over_budget_cached": engine.over_budget_cached,
+        "over_budget_rejected": engine.over_budget_rejected,
+    }
+    if write_behind is not None:
+        stats["write_behind"] = write_behind.stats()
+    if task_sync is not None:
+        stats["task_sync"] = task_sync.stats()
+    stats["idempotency"] = idempotency.stats()
+    return stats
+
+@registry.collector
+def state_metrics() -> List[str]:
+    cache = engine.task_cache.stats()
+    flights = upstream_flights.stats()
+    lines = (
+        gauge_lines("task_cache_hits_total", "Task cache hits", cache["hits"], "counter")
+        + gauge_lines("task_cache_misses_total", "Task cache misses", cache["misses"], "counter")
+        + gauge_lines("task_cache_evictions_total", "Task cache LRU evictions", cache["evictions"], "counter")
+        + gauge_lines("task_cache_entries", "Tokens with a cached task list", cache["entries"])
+        + gauge_lines("upstream_singleflight_issued_total", "Upstream reads actually sent", flights["issued"], "counter")
+        + gauge_lines("upstream_singleflight_coalesced_total", "Upstream reads served by an in-flight call", flights["coalesced"], "counter")
+        + gauge_lines("chat_socket_open_connections", "Open /ws/chat connections", len(open_sockets))
+        + gauge_lines("intent_match_over_budget_total", "Messages given up on as unknown after INTENT_MATCH_BUDGET", intent_matcher.over_budget, "counter")
+    )
+    breakers = client.stats()["breakers"]
+    if breakers:
+        lines += [
+            "# HELP upstream_circuit_state Circuit breaker state by endpoint (0 closed, 1 half-open, 2 open)",
+            "# TYPE upstream_circuit_state gauge",
+        ] + [
+            f'upstream_circuit_state{{endpoint="{endpoint}"}} {CIRCUIT_STATES[b["state"]]}'
+            for endpoint, b in breakers.items()
+        ]
+    decisions = []
+    if chat_limiter is not None:
+        decisions += [("chat", "allowed", chat_limiter.allowed), ("chat", "rejected", chat_limiter.rejected)]
+    if upstream_budget is not None:
+        # A reply needing an upstream read over budget comes from the cache when there is one
+        decisions += [
+            ("upstream", "allowed", upstream_budget.allowed),
+            ("upstream", "cached", engine.over_budget_cached),
+            ("upstream", "rejected", engine.over_budget_rejected),
+        ]
+    if decisions:
+        lines += [
+            "# HELP rate_limit_decisions_total Per-token rate limiter decisions by limit and outcome",
+            "# TYPE rate_limit_decisions_total counter",
+        ] + [
+            f'rate_limit_decisions_total{{limit="{limit}",decision="{decision}"}} {value}'
+            for limit, decision, value in decisions
+        ]
+    if write_behind is not None:
+        writes = write_behind.stats()
+        lines += (
+            gauge_lines("write_behind_pending", "Journaled writes not yet synced upstream", writes["pending"])
+            + gauge_lines("write_behind_synced_total", "Journaled writes accepted upstream", writes["synced"], "counter")
+            + gauge_lines("write_behind_dropped_total", "Journaled writes rejected upstream and dropped", writes["dropped"], "counter")
+        )
+    keyed = idempotency.stats()
+    lines += [
+        "# HELP idempotent_requests_total Writes sent with an idempotency key, by outcome",
+        "# TYPE idempotent_requests_total counter",
+    ] + [
+        f'idempotent_requests_total{{result="{result}"}} {keyed[field]}'
+        for result, field in (("executed", "executed"), ("replayed", "replayed"), ("conflict", "conflicts"))
+    ]
+    if task_sync is not None:
+        synced = task_sync.stats()
+        lines += gauge_lines("task_sync_active_tokens", "Tokens whose task list is synced in the background", synced["active_tokens"]) + [
+            "# HELP task_sync_refreshes_total Background task list refreshes by result",
+            "# TYPE task_sync_refreshes_total counter",
+        ] + [
+            f'task_sync_refreshes_total{{result="{result}"}} {synced[result]}'
+            for result in ("unchanged", "changed", "failed")
+        ]
+    return lines
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of chat, upstream, cache and single-flight metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
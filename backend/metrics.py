@@ -0,0 +1,176 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds; the fast ones cover in-process work like intent parsing
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels.
+
+    Updates happen on the event loop thread only, so no locking is needed.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """Metrics plus callbacks for values owned elsewhere (cache stats, ...), rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Callable[[], Iterator[str]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterator[str]]) -> Callable[[], Iterator[str]]:
+        self.collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help: str, value: float, kind: str = "gauge") -> List[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+registry = Registry()
+
+CHAT_INTENTS = registry.counter("chat_intents_total", "Chat messages by identified intent", ["intent"])
+CHAT_STAGE_SECONDS = registry.histogram(
+    "chat_stage_seconds",
+    "Time per chat stage (parse, upstream, format) by intent",
+    ["intent", "stage"],
+    buckets=FAST_BUCKETS + DEFAULT_BUCKETS[2:],
+)
+CHAT_REQUEST_SECONDS = registry.histogram("chat_request_seconds", "End-to-end chat handling time by intent", ["intent"])
+UPSTREAM_SECONDS = registry.histogram("upstream_request_seconds", "One List API call latency by endpoint", ["endpoint"])
+CHAT_UPSTREAM_CALLS = registry.counter(
+    "chat_upstream_calls_total", "One List API calls made while handling each intent", ["intent", "endpoint"]
+)
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total", "Failed One List API calls by endpoint and HTTP status (or error type)", ["endpoint", "status"]
+)
+UPSTREAM_REJECTED = registry.counter(
+    "upstream_rejected_total", "One List API calls refused while the endpoint's circuit breaker was open", ["endpoint"]
+)
+UPSTREAM_HEDGES = registry.counter(
+    "upstream_hedged_requests_total", "Duplicate GETs sent after the first attempt exceeded the hedge delay", ["endpoint"]
+)
+UPSTREAM_HEDGE_WINS = registry.counter(
+    "upstream_hedge_wins_total", "Hedged GETs that answered before the original attempt", ["endpoint"]
+)
+CHAT_SOCKET_CONNECTIONS = registry.counter("chat_socket_connections_total", "/ws/chat connections accepted")
+CHAT_SOCKET_MESSAGES = registry.counter("chat_socket_messages_total", "Chat messages received over /ws/chat")
+
+
+@registry.collector
+def unknown_intent_ratio() -> List[str]:
+    total = CHAT_INTENTS.total()
+    unknown = CHAT_INTENTS.values.get(("unknown",), 0.0)
+    return gauge_lines("chat_unknown_intent_ratio", "Share of chat messages with no recognised intent", unknown / total if total else 0.0)
+
+
+class RequestStats:
+    """Upstream usage of the chat request running in the current context"""
+
+    __slots__ = ("intent", "upstream_seconds")
+
+    def __init__(self, intent: str):
+        self.intent = intent
+        self.upstream_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def record_upstream(endpoint: str, seconds: float, status: Optional[str] = None) -> None:
+    """Record one upstream call; `status` is set for failures"""
+    UPSTREAM_SECONDS.observe(seconds, endpoint)
+    if status is not None:
+        UPSTREAM_ERRORS.inc(endpoint, status)
+    stats = current_request.get()
+    if stats is not None:
+        stats.upstream_seconds += seconds
+        CHAT_UPSTREAM_CALLS.inc(stats.intent, endpoint)
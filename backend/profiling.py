@@ -0,0 +1,46 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+
+# Off by default; when on, a request opts in with an "X-Profile: 1" header
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "") == "1"
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "25"))
+
+logger = logging.getLogger(__name__)
+
+
+async def profile_request(request, call_next):
+    """HTTP middleware that profiles requests carrying "X-Profile: 1" and logs the report.
+
+    Uses pyinstrument's sampling profiler when it is installed and falls back
+    to cProfile. Either way the profiler sees the whole event loop thread, so
+    concurrent requests show up in the report too.
+    """
+    if request.headers.get("x-profile") != "1":
+        return await call_next(request)
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        try:
+            return await call_next(request)
+        finally:
+            profiler.stop()
+            logger.info("Profile for %s %s\n%s", request.method, request.url.path, profiler.output_text())
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return await call_next(request)
+    finally:
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        logger.info("Profile for %s %s\n%s", request.method, request.url.path, report.getvalue())
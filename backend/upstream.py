@@ -0,0 +1,214 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.metrics import UPSTREAM_HEDGE_WINS, UPSTREAM_HEDGES, UPSTREAM_REJECTED, record_upstream
+from engine.circuit_breaker import CircuitBreaker, CircuitOpenError
+from engine.rate_limit import RateLimited
+from engine.tasks import Task, decode_task, decode_tasks
+
+# Pool and timeout settings, overridable through the environment
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.0"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10.0"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30.0"))
+# A GET still unanswered after this percentile of the endpoint's recent latencies
+# gets a duplicate request; 0 turns hedging off
+UPSTREAM_HEDGE_PERCENTILE = float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0.95"))
+UPSTREAM_HEDGE_MIN_DELAY = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.05"))
+# Successful latencies kept per endpoint, and how many are needed before hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+# Failures of requests that never reached the API, or that it turned down without acting on
+NOT_SENT_ERRORS = (
+    CircuitOpenError,
+    RateLimited,
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.LocalProtocolError,
+    httpx.UnsupportedProtocol,
+    httpx.ProxyError,
+)
+
+
+def write_not_applied(e: Exception) -> bool:
+    """True if a write that raised `e` certainly did not change anything, so running it again is safe.
+
+    Anything else (a read timeout, a dropped connection, a 5xx) may have
+    come after the API applied the write.
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code < 500
+    return isinstance(e, NOT_SENT_ERRORS)
+
+
+class OneListClient:
+    """Async One List API client sharing one pooled keep-alive connection set"""
+
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float = UPSTREAM_CONNECT_TIMEOUT,
+        read_timeout: float = UPSTREAM_READ_TIMEOUT,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        hedge_percentile: float = UPSTREAM_HEDGE_PERCENTILE,
+        hedge_min_delay: float = UPSTREAM_HEDGE_MIN_DELAY,
+    ):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Create the underlying connection pool on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+            )
+        return self._client
+
+    async def open(self) -> None:
+        """Create the connection pool now; httpx loads its transport and TLS setup lazily on first use"""
+        self.client
+
+    async def close(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Circuit breaker for one route template, so a failing endpoint does not block the others"""
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging a GET, or None while hedging is off or history is short"""
+        samples = self._latencies.get(endpoint)
+        if not self.hedge_percentile or samples is None or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return max(ordered[min(int(len(ordered) * self.hedge_percentile), len(ordered) - 1)], self.hedge_min_delay)
+
+    def stats(self) -> Dict:
+        """Breaker state and current hedge delay per endpoint"""
+        return {
+            "breakers": {endpoint: b.stats() for endpoint, b in self.breakers.items()},
+            "hedge_delay": {endpoint: self.hedge_delay(endpoint) for endpoint in self._latencies},
+        }
+
+    async def _request(self, method: str, path: str, token: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Send one call; `endpoint` is the route template used as the metrics label and breaker key"""
+        breaker = self.breaker(endpoint)
+        try:
+            probe = breaker.before_call()
+        except CircuitOpenError:
+            UPSTREAM_REJECTED.inc(endpoint)
+            raise
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, path, params={"access_token": token}, **kwargs
+            )
+        except httpx.HTTPError as e:
+            record_upstream(endpoint, time.perf_counter() - start, type(e).__name__)
+            breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # A hedge that lost, or a caller that went away: let the next call probe instead
+            if probe:
+                breaker.record_abandoned()
+            raise
+        elapsed = time.perf_counter() - start
+        # 304 only ever answers a conditional GET we asked for
+        ok = response.is_success or response.status_code == 304
+        record_upstream(endpoint, elapsed, None if ok else str(response.status_code))
+        # A 4xx is about the request, not the API's health
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if not ok:
+            response.raise_for_status()
+        self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+        return response
+
+    async def _get(self, path: str, token: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Idempotent GET, hedged with a second attempt when the first is slower than usual.
+
+        The first successful answer wins and the other attempt is cancelled;
+        if both fail the original attempt's error is raised.
+        """
+        delay = self.hedge_delay(endpoint)
+        if delay is None:
+            return await self._request("GET", path, token, endpoint, **kwargs)
+        attempts = [asyncio.ensure_future(self._request("GET", path, token, endpoint, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                UPSTREAM_HEDGES.inc(endpoint)
+                attempts.append(asyncio.ensure_future(self._request("GET", path, token, endpoint, **kwargs)))
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((a for a in done if a.exception() is None), None)
+                if winner is not None:
+                    if winner is not attempts[0]:
+                        UPSTREAM_HEDGE_WINS.inc(endpoint)
+                    return winner.result()
+            return attempts[0].result()
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def list_items(self, token: str) -> List[Task]:
+        """GET /items"""
+        response = await self._get("/items", token, "GET /items")
+        return decode_tasks(response.content)
+
+    async def list_items_if_changed(self, token: str, etag: Optional[str]) -> Tuple[Optional[List[Task]], Optional[str]]:
+        """GET /items with If-None-Match; returns (None, etag) when the API answers 304 Not Modified"""
+        headers = {"If-None-Match": etag} if etag else None
+        response = await self._get("/items", token, "GET /items", headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return decode_tasks(response.content), response.headers.get("ETag")
+
+    async def get_item(self, token: str, item_id) -> Task:
+        """GET /items/{id}"""
+        response = await self._get(f"/items/{item_id}", token, "GET /items/{id}")
+        return decode_task(response.content)
+
+    async def create_item(self, token: str, text: str) -> Task:
+        """POST /items"""
+        response = await self._request("POST", "/items", token, "POST /items", json={"text": text})
+        return decode_task(response.content)
+
+    async def update_item(self, token: str, item_id, **fields) -> Dict:
+        """PUT /items/{id}"""
+        response = await self._request("PUT", f"/items/{item_id}", token, "PUT /items/{id}", json=fields)
+        return response.json() if response.content else {}
+
+    async def delete_item(self, token: str, item_id) -> None:
+        """DELETE /items/{id}"""
+        await self._request("DELETE", f"/items/{item_id}", token, "DELETE /items/{id}")
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from engine.tasks import Task
+
+# Optional mode: writes are acknowledged from a local journal and synced in the background
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND", "") == "1"
+WRITE_BEHIND_JOURNAL = os.getenv("WRITE_BEHIND_JOURNAL", "write_behind.sqlite3")
+WRITE_BEHIND_RETRY_BASE = float(os.getenv("WRITE_BEHIND_RETRY_BASE", "0.5"))
+WRITE_BEHIND_RETRY_MAX = float(os.getenv("WRITE_BEHIND_RETRY_MAX", "60"))
+
+LOCAL_ID_PREFIX = "local-"
+# Local ids of synced adds remembered with their real id, for references made before the sync
+SYNCED_IDS_KEPT = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class WriteJournal:
+    """Append-only SQLite journal of writes not yet confirmed by the One List API"""
+
+    def __init__(self, path: str = WRITE_BEHIND_JOURNAL):
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS ops ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " token TEXT NOT NULL,"
+            " op TEXT NOT NULL,"
+            " item_id TEXT,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+
+    def append(self, token: str, op: str, item_id: Optional[str], payload: Dict) -> int:
+        cursor = self.db.execute(
+            "INSERT INTO ops (token, op, item_id, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (token, op, item_id, json.dumps(payload), time.time()),
+        )
+        return cursor.lastrowid
+
+    def load(self) -> List[Dict]:
+        rows = self.db.execute("SELECT seq, token, op, item_id, payload, attempts FROM ops ORDER BY seq")
+        return [
+            {"seq": seq, "token": token, "op": op, "item_id": item_id, "payload": json.loads(payload), "attempts": attempts}
+            for seq, token, op, item_id, payload, attempts in rows
+        ]
+
+    def remove(self, seq: int) -> None:
+        self.db.execute("DELETE FROM ops WHERE seq = ?", (seq,))
+
+    def record_attempt(self, seq: int) -> None:
+        self.db.execute("UPDATE ops SET attempts = attempts + 1 WHERE seq = ?", (seq,))
+
+    def remap(self, token: str, local_id: str, real_id: str) -> None:
+        self.db.execute("UPDATE ops SET item_id = ? WHERE token = ? AND item_id = ?", (real_id, token, local_id))
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class WriteBehindStore:
+    """Acknowledge add/complete/delete immediately and replay them upstream in order per token.
+
+    Each write is journaled before it is acknowledged, so pending writes
+    survive a restart. One worker per token replays that token's writes in
+    journal order with exponential backoff on failures. Tasks created locally
+    carry a "local-<seq>" id until their POST succeeds; later writes that
+    refer to that id are remapped to the real one, and so are writes made
+    later through a local id that was remembered elsewhere, e.g. in a
+    session's task numbers (see `current_id`).
+
+    `on_synced(token, op, real_task)` and `on_dropped(token, op)` let the
+    caller keep its task cache in line with what the API accepted.
+    """
+
+    def __init__(self, client, journal: WriteJournal, on_synced: Callable = None, on_dropped: Callable = None):
+        self.client = client
+        self.journal = journal
+        self.on_synced = on_synced
+        self.on_dropped = on_dropped
+        self.pending: Dict[str, List[Dict]] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        self.synced_ids: "OrderedDict[str, str]" = OrderedDict()
+        self.synced = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        """Load unsynced writes from the journal and start replaying them"""
+        for op in self.journal.load():
+            self.pending.setdefault(op["token"], []).append(op)
+        for token in self.pending:
+            self._ensure_worker(token)
+
+    async def stop(self) -> None:
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.journal.close()
+
+    def add(self, token: str, text: str) -> Task:
+        seq = self._append(token, "add", None, {"text": text})
+        return Task(f"{LOCAL_ID_PREFIX}{seq}", text, False)
+
+    def complete(self, token: str, item_id) -> None:
+        self._append(token, "complete", str(self.current_id(item_id)), {"complete": True})
+
+    def delete(self, token: str, item_id) -> None:
+        self._append(token, "delete", str(self.current_id(item_id)), {})
+
+    def current_id(self, item_id):
+        """The real id of a local task whose add has synced, otherwise `item_id` unchanged"""
+        return self.synced_ids.get(str(item_id), item_id)
+
+    def overlay(self, token: str, tasks: List[Task], fetch_started: Optional[float] = None) -> List[Task]:
+        """Apply this token's unsynced writes to a freshly fetched list.
+
+        `fetch_started` is the `time.monotonic()` at which the fetch was sent.
+        An add whose POST went out before then is left out: the list may
+        already hold the created task, and when the add syncs `on_synced`
+        puts the task the API returned in the cached list.
+        """
+        ops = self.pending.get(token)
+        if not ops:
+            return tasks
+        merged = {str(t.id): t for t in tasks}
+        for op in ops:
+            if op["op"] == "add":
+                if fetch_started is not None and op.get("sent_at", fetch_started) < fetch_started:
+                    continue
+                local_id = f"{LOCAL_ID_PREFIX}{op['seq']}"
+                merged[local_id] = Task(local_id, op["payload"]["text"], False)
+            elif op["op"] == "complete" and op["item_id"] in merged:
+                merged[op["item_id"]] = merged[op["item_id"]]._replace(complete=True)
+            elif op["op"] == "delete":
+                merged.pop(op["item_id"], None)
+        return list(merged.values())
+
+    def overlay_task(self, token: str, task: Task) -> Optional[Task]:
+        """Apply this token's unsynced writes to one task; None if one of them deletes it"""
+        for op in self.pending.get(token, ()):
+            if op["item_id"] != str(task.id):
+                continue
+            if op["op"] == "complete":
+                task = task._replace(complete=True)
+            elif op["op"] == "delete":
+                return None
+        return task
+
+    def stats(self) -> Dict:
+        return {
+            "pending": sum(len(ops) for ops in self.pending.values()),
+            "tokens": len(self.pending),
+            "synced": self.synced,
+            "dropped": self.dropped,
+        }
+
+    def _append(self, token: str, op: str, item_id: Optional[str], payload: Dict) -> int:
+        seq = self.journal.append(token, op, item_id, payload)
+        self.pending.setdefault(token, []).append(
+            {"seq": seq, "token": token, "op": op, "item_id": item_id, "payload": payload, "attempts": 0}
+        )
+        self._ensure_worker(token)
+        return seq
+
+    def _ensure_worker(self, token: str) -> None:
+        worker = self.workers.get(token)
+        if worker is None or worker.done():
+            self.workers[token] = asyncio.get_running_loop().create_task(self._replay(token))
+
+    async def _replay(self, token: str) -> None:
+        ops = self.pending[token]
+        while ops:
+            op = ops[0]
+            if op["op"] == "add":
+                # From here on a list fetched from the API may already hold the task
+                op.setdefault("sent_at", time.monotonic())
+            try:
+                real_task = await self._send(op)
+            except httpx.HTTPStatusError as e:
+                if 400 <= e.response.status_code < 500 and e.response.status_code != 429:
+                    # The API will never accept this write (e.g. the task is gone)
+                    logger.warning("Dropping %s for token after HTTP %s", op["op"], e.response.status_code)
+                    self._finish(token, op)
+                    self.dropped += 1
+                    if self.on_dropped:
+                        self.on_dropped(token, op)
+                    continue
+                await self._backoff(op)
+                continue
+            except Exception:
+                await self._backoff(op)
+                continue
+
+            self._finish(token, op)
+            self.synced += 1
+            if op["op"] == "add":
+                local_id, real_id = f"{LOCAL_ID_PREFIX}{op['seq']}", str(real_task.id)
+                self.journal.remap(token, local_id, real_id)
+                self.synced_ids[local_id] = real_id
+                if len(self.synced_ids) > SYNCED_IDS_KEPT:
+                    self.synced_ids.popitem(last=False)
+                for later in ops:
+                    if later["item_id"] == local_id:
+                        later["item_id"] = real_id
+            if self.on_synced:
+                self.on_synced(token, op, real_task)
+        self.pending.pop(token, None)
+
+    async def _send(self, op: Dict) -> Optional[Task]:
+        token = op["token"]
+        if op["op"] == "add":
+            return await self.client.create_item(token, op["payload"]["text"])
+        if op["op"] == "complete":
+            return await self.client.update_item(token, op["item_id"], **op["payload"])
+        await self.client.delete_item(token, op["item_id"])
+        return None
+
+    async def _backoff(self, op: Dict) -> None:
+        op["attempts"] += 1
+        self.journal.record_attempt(op["seq"])
+        await asyncio.sleep(min(WRITE_BEHIND_RETRY_BASE * 2 ** (op["attempts"] - 1), WRITE_BEHIND_RETRY_MAX))
+
+    def _finish(self, token: str, op: Dict) -> None:
+        self.journal.remove(op["seq"])
+        self.pending[token].pop(0)
@@ -0,0 +1,102 @@
+"""Concurrent /chat throughput: blocking `requests` calls vs the pooled async client.
+
+    python benchmarks/bench_async_client.py --requests 200 --concurrency 20 --latency 0.05
+
+Both runs drive the real FastAPI app in-process against the local One List
+API stub, so the only difference is how upstream calls are made.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_api import start_stub  # noqa: E402
+from backend import main  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+from engine.task_cache import TaskCache  # noqa: E402
+
+TOKEN = "bench"
+MESSAGES = ["show all tasks", "list incomplete tasks", "show completed tasks", "show task 1"]
+
+
+class BlockingClient:
+    """Baseline: the old module-level `requests` calls behind the client interface"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def _call(self, method: str, path: str, token: str, **kwargs):
+        response = requests.request(
+            method, f"{self.base_url}{path}", params={"access_token": token}, **kwargs
+        )
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    async def list_items(self, token):
+        return self._call("GET", "/items", token)
+
+    async def get_item(self, token, item_id):
+        return self._call("GET", f"/items/{item_id}", token)
+
+    async def create_item(self, token, text):
+        return self._call("POST", "/items", token, json={"text": text})
+
+    async def update_item(self, token, item_id, **fields):
+        return self._call("PUT", f"/items/{item_id}", token, json=fields)
+
+    async def delete_item(self, token, item_id):
+        self._call("DELETE", f"/items/{item_id}", token)
+
+    async def close(self):
+        pass
+
+
+async def drive(upstream, total: int, concurrency: int) -> float:
+    main.engine.client = upstream
+    transport = httpx.ASGITransport(app=main.app)
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(MESSAGES[i % len(MESSAGES)])
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def worker():
+            while not queue.empty():
+                message = queue.get_nowait()
+                response = await http.post("/chat", json={"message": message, "access_token": TOKEN})
+                assert response.json()["success"], response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    await upstream.close()
+    return elapsed
+
+
+def run(label: str, upstream, total: int, concurrency: int) -> None:
+    elapsed = asyncio.run(drive(upstream, total, concurrency))
+    print(f"{label:<10} {total} requests in {elapsed:.2f}s -> {total / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--tasks", type=int, default=50, help="tasks seeded in the stub")
+    args = parser.parse_args()
+
+    server, url, store = start_stub(latency=args.latency)
+    store.seed(TOKEN, args.tasks)
+    # Measure upstream handling, not cache hits
+    main.engine.task_cache = TaskCache(ttl=0)
+
+    run("blocking", BlockingClient(url), args.requests, args.concurrency)
+    run("async", OneListClient(url), args.requests, args.concurrency)
+    server.shutdown()
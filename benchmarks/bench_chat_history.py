@@ -0,0 +1,69 @@
+"""Streamlit rerun time as a conversation grows: full history vs a paged window.
+
+    python benchmarks/bench_chat_history.py --sizes 50 200 1000 2000 --reruns 5
+
+Runs src/streamlit_app.py headless with Streamlit's AppTest, its chat
+history pre-filled with the given number of messages, and times a rerun:
+
+  unbounded  every message stays in memory and is rendered (the old behaviour)
+  paged      the latest CHAT_HISTORY_WINDOW messages are rendered, older ones
+             sit in a SQLite file until "Load earlier messages" is clicked
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit.logger  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from engine.chat_history import HISTORY_PAGE, HISTORY_WINDOW, ChatHistory  # noqa: E402
+from engine.shared_state import SQLiteStore  # noqa: E402
+
+APP = os.path.join(ROOT, "src", "streamlit_app.py")
+REPLY = "You have 10 task(s):\n" + "\n".join(f"{i}. ○ buy groceries item {i}" for i in range(1, 11))
+
+
+def rerun_ms(history: ChatHistory, reruns: int) -> float:
+    app = AppTest.from_file(APP, default_timeout=120)
+    app.session_state["session_id"] = history.session_id
+    app.session_state["history"] = history
+    app.run()
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        times.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(times)
+
+
+def filled(store, size: int, window: int, session_id: str) -> ChatHistory:
+    history = ChatHistory(store, session_id, window=window, page_size=HISTORY_PAGE)
+    for i in range(size // 2):
+        history.append("user", f"show all tasks ({i})")
+        history.append("assistant", REPLY)
+    return history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 2000], help="messages in the conversation")
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+    # Warm up imports once; seeding session state from outside a script run then logs a warning, so quiet it
+    AppTest.from_file(APP, default_timeout=120).run()
+    streamlit.logger.set_log_level("error")
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        store = SQLiteStore(os.path.join(state_dir, "history.sqlite3"))
+        print(f"{'messages':>8}  {'unbounded':>12}  {'paged':>12}  (window {HISTORY_WINDOW}, median rerun)")
+        for size in args.sizes:
+            unbounded = rerun_ms(filled(None, size, sys.maxsize, f"unbounded-{size}"), args.reruns)
+            paged = rerun_ms(filled(store, size, HISTORY_WINDOW, f"paged-{size}"), args.reruns)
+            print(f"{size:8d}  {unbounded:9.1f} ms  {paged:9.1f} ms")
+        store.close()
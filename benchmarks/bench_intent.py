@@ -0,0 +1,74 @@
+"""Intent matching throughput: per-pattern re.search loop vs the compiled matcher.
+
+    python benchmarks/bench_intent.py --rounds 2000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.intents import INTENT_PATTERNS, identify_intent  # noqa: E402
+
+CORPUS = [
+    "Add a task to buy milk",
+    "add a new task to finish the project report",
+    "create task to call mom",
+    "new task: water the plants",
+    "remind me to pay the electricity bill",
+    "Show all tasks",
+    "what are my tasks",
+    "show me my tasks",
+    "list incomplete tasks",
+    "what is still pending?",
+    "Show my completed tasks",
+    "finished tasks",
+    "show task 2",
+    "task number 7",
+    "Mark buy milk as done",
+    "mark \"finish the project report\" as completed",
+    "complete task 3",
+    "finish groceries",
+    "delete buy milk",
+    "remove task 'call mom'",
+    "hello there",
+    "can you help me organise my week?",
+    "thanks!",
+]
+
+
+def legacy_identify_intent(message: str) -> tuple:
+    """The original nested loop, kept here as the baseline"""
+    message = message.lower().strip()
+    for intent, patterns in INTENT_PATTERNS.items():
+        for pattern in patterns:
+            match = re.search(pattern, message, re.IGNORECASE)
+            if match:
+                params = match.groups() if match.groups() else None
+                return intent, params
+    return "unknown", None
+
+
+def measure(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in CORPUS:
+            func(message)
+    return rounds * len(CORPUS) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    for message in CORPUS:
+        expected, actual = legacy_identify_intent(message), identify_intent(message)
+        assert expected == actual, f"{message!r}: {expected} != {actual}"
+
+    legacy = measure(legacy_identify_intent, args.rounds)
+    compiled = measure(identify_intent, args.rounds)
+    print(f"legacy loop   {legacy:>12,.0f} messages/sec")
+    print(f"compiled      {compiled:>12,.0f} messages/sec  ({compiled / legacy:.2f}x)")
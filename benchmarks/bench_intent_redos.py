@@ -0,0 +1,118 @@
+"""Intent matching time on pathological messages: the old patterns vs the linear ones.
+
+    python benchmarks/bench_intent_redos.py --sizes 250 1000 4000
+
+Each input is built to make a backtracking pattern rescan the message from
+every position it could start at:
+
+  show repeated   "show show show ..."; `show .*pending` tries every "show"
+  mark repeated   "mark mark mark ..."; `mark (.+?) as done` likewise
+  space run       "mark all with x", a run of spaces, "y"; `\\s*$` rescans the run
+                  from every position of the lazy name before it
+
+"old" is the pattern table before the rewrite (lowercased and stripped
+messages, as identify_intent did), "linear" the current patterns on their
+own (no length limit or time budget) and "served" is identify_intent as the
+chat endpoints call it, with MAX_MESSAGE_LENGTH and INTENT_MATCH_BUDGET.
+Sizes are message lengths in characters; the old patterns take seconds past
+a few thousand. Intents on the bench_intent.py corpus are checked first.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_intent import CORPUS  # noqa: E402
+from engine.intents import MAX_MESSAGE_LENGTH, IntentMatcher, identify_intent, intent_matcher  # noqa: E402
+
+# INTENT_PATTERNS before the rewrite
+OLD_PATTERNS = {
+    "add_task": [
+        r"add\s+(?:a\s+)?(?:new\s+)?task\s+(?:to\s+)?(.+)",
+        r"create\s+(?:a\s+)?(?:new\s+)?task\s+(?:to\s+)?(.+)",
+        r"new\s+task[:\s]+(.+)",
+        r"remind\s+me\s+to\s+(.+)",
+    ],
+    "complete_all": [
+        r"^(?:mark|set|complete|finish)\s+(?:all|every|everything)(?:\s+(?:of\s+)?(?:my|the))?(?:\s+(incomplete|pending|unfinished))?(?:\s+(?:tasks?|items?))?(?:\s+(?:containing|with|matching|about|that\s+contains?)\s+['\"]?(.+?)['\"]?)?(?:\s+(?:as\s+)?(?:done|complete|completed|finished))?\s*$",
+    ],
+    "delete_all": [
+        r"^(?:delete|remove|clear)\s+(?:all|every|everything)(?:\s+(?:of\s+)?(?:my|the))?(?:\s+(complete|completed|done|finished|incomplete|pending|unfinished))?(?:\s+(?:tasks?|items?))?(?:\s+(?:containing|with|matching|about|that\s+contains?)\s+['\"]?(.+?)['\"]?)?\s*$",
+    ],
+    "list_page": [
+        r"^(?:(?:show|list|view|get|display)\s+)?(?:me\s+)?page\s+(\d+)(?:\s+of\s+(?:my\s+)?(all|incomplete|pending|unfinished|complete|completed|done|finished))?",
+    ],
+    "list_next": [
+        r"^(?:(?:show|list|view|get|display)\s+)?(?:me\s+)?(?:the\s+)?next(?:\s+(\d+))?(?:\s+(all|incomplete|pending|unfinished|complete|completed|done|finished))?(?:\s+(?:tasks?|items?|page))?\s*$",
+        r"^(?:show|list)\s+more(?:\s+tasks?)?\s*$",
+    ],
+    "list_tasks": [
+        r"(?:show|list|view|display|get)\s+(?:all\s+)?(?:my\s+)?tasks?",
+        r"what\s+(?:are\s+)?(?:my\s+)?tasks?",
+        r"show\s+me\s+(?:my\s+)?(?:all\s+)?tasks?",
+    ],
+    "list_incomplete": [
+        r"(?:show|list|view|what)\s+.*(?:incomplete|pending|unfinished|undone)",
+        r"(?:incomplete|pending|unfinished|undone)\s+tasks?",
+    ],
+    "list_complete": [
+        r"(?:show|list|view|what)\s+.*(?:complete|completed|done|finished)",
+        r"(?:complete|completed|done|finished)\s+tasks?",
+    ],
+    "view_task": [
+        r"(?:show|view|display|get)\s+task\s+(?:number\s+)?(\d+)",
+        r"task\s+(?:number\s+)?(\d+)",
+    ],
+    "complete_task": [
+        r"^(?:complete|finish|done)\s+(?:task\s+)?(?:number\s+|#)?(\d+)$",
+        r"(?:mark|set|complete|finish)\s+(?:task\s+)?['\"]?(.+?)['\"]?\s+(?:as\s+)?(?:done|complete|completed|finished)",
+        r"(?:done|complete|finish)\s+(?:task\s+)?['\"]?(.+?)['\"]?",
+        r"complete\s+task\s+(\d+)",
+    ],
+    "delete_task": [
+        r"^(?:delete|remove)\s+(?:task\s+)?(?:number\s+|#)?(\d+)$",
+        r"delete\s+(?:task\s+)?['\"]?(.+?)['\"]?",
+        r"remove\s+(?:task\s+)?['\"]?(.+?)['\"]?",
+    ],
+}
+
+INPUTS = {
+    "show repeated": lambda size: ("show " * (size // 5 + 1))[:size],
+    "mark repeated": lambda size: ("mark " * (size // 5 + 1))[:size],
+    "space run": lambda size: "mark all with x" + " " * (size - 16) + "y",
+}
+
+
+def best_ms(func, message: str, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(message)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    old = IntentMatcher(OLD_PATTERNS, budget=float("inf"))
+    linear = IntentMatcher(intent_matcher.patterns, budget=float("inf"))
+    for message in CORPUS:
+        before, after = old.match(message.lower().strip()), identify_intent(message)
+        assert before[0] == after[0], f"{message!r}: {before[0]} != {after[0]}"
+        if (before[1] or None) != after[1]:
+            print(f"{message!r} {before[0]}: {before[1]} -> {after[1]}")
+
+    print(f"{'input':<14} {'chars':>6}  {'old':>10}  {'linear':>10}  {'served':>10}  (MAX_MESSAGE_LENGTH {MAX_MESSAGE_LENGTH})")
+    for label, build in INPUTS.items():
+        for size in args.sizes:
+            message = build(size)
+            old_ms = best_ms(lambda m: old.match(m.lower().strip()), message, args.rounds)
+            linear_ms = best_ms(lambda m: linear.match(" ".join(m.lower().split())), message, args.rounds)
+            served_ms = best_ms(identify_intent, message, args.rounds)
+            print(f"{label:<14} {size:6d}  {old_ms:7.2f} ms  {linear_ms:7.2f} ms  {served_ms:7.3f} ms")
@@ -0,0 +1,68 @@
+"""Cost of asking for an unchanged list again once the cached copy has expired.
+
+    python benchmarks/bench_render_cache.py --tasks 2000 --messages 200
+
+Every request goes back to the local One List API stub (cache TTL 0):
+
+  no reuse   the cached list is dropped first, so the list is fetched and
+             partitioned and the reply rendered from scratch (the old behaviour)
+  compare    full GET, the list compares equal to the cached one, which is
+             kept together with its rendered reply
+  etag       conditional GET answered with 304 Not Modified, nothing is
+             downloaded or rendered
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_api import start_stub  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+from engine.chat import ChatEngine  # noqa: E402
+from engine.task_cache import TaskCache  # noqa: E402
+
+TOKEN = "bench"
+
+
+class PlainClient(OneListClient):
+    """OneListClient without conditional requests, for APIs that send no ETag"""
+
+    list_items_if_changed = None
+
+
+async def run(label: str, client, total: int, drop_cache: bool) -> None:
+    engine = ChatEngine(client, task_cache=TaskCache(ttl=0))
+    await engine.handle("show all tasks", TOKEN)
+    latencies = []
+    for _ in range(total):
+        if drop_cache:
+            engine.task_cache.invalidate(TOKEN)
+        start = time.perf_counter()
+        reply = await engine.handle("show all tasks", TOKEN)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        assert reply.success, reply.response
+    await client.close()
+    latencies.sort()
+    print(
+        f"{label:<10} mean {statistics.mean(latencies):6.2f} ms  "
+        f"p50 {latencies[len(latencies) // 2]:6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    server, url, store = start_stub()
+    store.seed(TOKEN, args.tasks)
+    # PlainClient hides list_items_if_changed, so the engine falls back to a full GET
+    asyncio.run(run("no reuse", PlainClient(url), args.messages, drop_cache=True))
+    asyncio.run(run("compare", PlainClient(url), args.messages, drop_cache=False))
+    asyncio.run(run("etag", OneListClient(url), args.messages, drop_cache=False))
+    server.shutdown()
@@ -0,0 +1,87 @@
+"""Import time and first-message latency of both entry points, each in a fresh interpreter.
+
+    python benchmarks/bench_startup.py --runs 10
+
+"backend" imports `backend.main`, runs its start-up hooks and sends one /chat
+through the app in-process; "streamlit" imports `src/nlp_logic.py` (what `src/streamlit_app.py`
+loads besides Streamlit itself) and calls `handle_chat` once. Both talk to the
+local One List API stub, so the first message measures start-up work such as
+building clients and compiling patterns rather than network time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_api import start_stub  # noqa: E402
+
+TOKEN = "bench"
+MESSAGE = "show all tasks"
+
+BACKEND = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from backend import main
+imported = time.perf_counter()
+import httpx
+
+async def start_and_send():
+    begin = time.perf_counter()
+    # Run the app's start-up hooks as uvicorn would
+    async with main.lifespan(main.app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            await http.post("/chat", json={"message": sys.argv[1], "access_token": sys.argv[2]})
+        return started - begin, time.perf_counter() - started
+
+startup, first = asyncio.run(start_and_send())
+print(json.dumps({"import": imported - start, "startup": startup, "first": first}))
+"""
+
+STREAMLIT = """
+import json, sys, time
+start = time.perf_counter()
+import nlp_logic
+imported = time.perf_counter()
+nlp_logic.handle_chat(sys.argv[1], sys.argv[2])
+print(json.dumps({"import": imported - start, "startup": 0.0, "first": time.perf_counter() - imported}))
+"""
+
+
+def measure(code: str, runs: int, env: dict) -> dict:
+    samples = {"import": [], "startup": [], "first": []}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code, MESSAGE, TOKEN], env=env, cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for key in samples:
+            samples[key].append(result[key] * 1e3)
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    server, url, store = start_stub()
+    store.seed(TOKEN, 50)
+    env = {
+        **os.environ,
+        "ONE_LIST_API_URL": url,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "src")]),
+    }
+    for label, code in (("backend", BACKEND), ("streamlit", STREAMLIT)):
+        result = measure(code, args.runs, env)
+        print(
+            f"{label:<10} import {result['import']:7.1f} ms  start-up {result['startup']:6.1f} ms  "
+            f"first message {result['first']:6.1f} ms  (median of {args.runs})"
+        )
+    server.shutdown()
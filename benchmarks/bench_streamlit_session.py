@@ -0,0 +1,53 @@
+"""Per-message latency of the Streamlit path: a new connection per call vs the pooled session.
+
+    python benchmarks/bench_streamlit_session.py --messages 200
+
+The task cache is disabled so every message reaches the local One List API
+stub. The stub speaks plain HTTP; against the real HTTPS API each avoided
+connection also saves a TLS handshake, so the gap is larger there.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from stub_api import start_stub  # noqa: E402
+import nlp_logic  # noqa: E402
+from engine.task_cache import TaskCache  # noqa: E402
+
+TOKEN = "bench"
+MESSAGES = ["show all tasks", "list incomplete tasks", "show task 1", "mark task 2 buy groceries item 2 as done"]
+
+
+def run(label: str, session, total: int) -> None:
+    latencies = []
+    for i in range(total):
+        start = time.perf_counter()
+        nlp_logic.handle_chat(MESSAGES[i % len(MESSAGES)], TOKEN, session=session)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    latencies.sort()
+    print(
+        f"{label:<16} mean {statistics.mean(latencies):6.2f} ms  "
+        f"p50 {latencies[len(latencies) // 2]:6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency in seconds")
+    args = parser.parse_args()
+
+    server, url, store = start_stub(latency=args.latency)
+    store.seed(TOKEN, 50)
+    os.environ["ONE_LIST_API_URL"] = url
+    nlp_logic.task_cache = TaskCache(ttl=0)
+
+    run("new connection", None, args.messages)
+    run("pooled session", nlp_logic.create_session(), args.messages)
+    server.shutdown()
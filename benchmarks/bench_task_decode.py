@@ -0,0 +1,86 @@
+"""Decode time and memory of a GET /items body: the API's dicts vs compact `Task` tuples.
+
+    python benchmarks/bench_task_decode.py --sizes 1000 10000 100000
+
+The body is what the One List API sends (id, text, complete and two
+timestamps per item). For each size:
+
+  dicts        json.loads, every field kept (the old `response.json()`)
+  tasks        decode_tasks: msgspec decodes only the Task fields
+
+Memory is what the decoded list keeps alive (tracemalloc). "partition" is
+the first step of every list reply: splitting the list by completion status.
+"compare" is the equality check TaskCache.set runs on every refetch to keep
+the cached list (and its rendered replies) when nothing changed.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.task_views import partition_tasks  # noqa: E402
+from engine.tasks import decode_tasks  # noqa: E402
+
+
+def make_body(count: int) -> bytes:
+    now = datetime.now(timezone.utc).isoformat()
+    return json.dumps([
+        {"id": i, "text": f"task {i} buy groceries item {i % 97}", "complete": i % 3 == 0, "created_at": now, "updated_at": now}
+        for i in range(count)
+    ]).encode()
+
+
+def partition_dicts(tasks):
+    """partition_tasks as it was written for the API's dicts"""
+    incomplete, complete = [], []
+    for t in tasks:
+        (complete if t.get("complete") else incomplete).append(t)
+    return {"list_tasks": tasks, "list_incomplete": incomplete, "list_complete": complete}
+
+
+def best_ms(func, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def retained_mb(decode) -> float:
+    gc.collect()
+    tracemalloc.start()
+    kept = decode()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [("dicts", lambda body: json.loads(body), partition_dicts), ("tasks", decode_tasks, partition_tasks)]
+
+    for size in args.sizes:
+        body = make_body(size)
+        print(f"{size:>7} items ({len(body) / 2**20:.1f} MB body)")
+        for label, decode, partition in variants:
+            decode_ms = best_ms(lambda: decode(body), args.rounds)
+            tasks, again = decode(body), decode(body)
+            partition_ms = best_ms(lambda: partition(tasks), args.rounds)
+            compare_ms = best_ms(lambda: tasks == again, args.rounds)
+            memory = retained_mb(lambda: decode(body))
+            print(
+                f"  {label:<13} decode {decode_ms:8.2f} ms  partition {partition_ms:6.2f} ms  "
+                f"compare {compare_ms:6.2f} ms  memory {memory:7.2f} MB"
+            )
@@ -0,0 +1,68 @@
+"""Name-based task lookup: linear substring scan vs the TaskIndex.
+
+    python benchmarks/bench_task_lookup.py --sizes 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.task_index import TaskIndex  # noqa: E402
+from engine.tasks import Task  # noqa: E402
+
+VERBS = ["buy", "call", "email", "fix", "clean", "book", "pay", "write", "review", "pick up"]
+OBJECTS = [
+    "milk", "bread", "the car", "mom", "dentist", "report", "invoice", "garage",
+    "kitchen", "tickets", "rent", "slides", "groceries", "passport", "plumber",
+]
+
+
+def make_tasks(count: int):
+    rng = random.Random(count)
+    return [
+        Task(i, f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.randint(1, 5000)}", False)
+        for i in range(count)
+    ]
+
+
+def legacy_find(tasks, name):
+    """The original find_task_by_name scan"""
+    name = name.lower().strip().strip('"\'')
+    for task in tasks:
+        if name in task.text.lower():
+            return task
+    return None
+
+
+def time_per_call(func, queries, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (rounds * len(queries)) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        tasks = make_tasks(size)
+        queries = [tasks[size // 2].text, tasks[-1].text.upper(), "dentist 42", "pay rent", "passp", "invoce 17", "not there"]
+
+        start = time.perf_counter()
+        index = TaskIndex(tasks)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        scan_us = time_per_call(lambda q: legacy_find(tasks, q), queries, args.rounds)
+        index_us = time_per_call(index.best, queries, args.rounds)
+        print(f"{size:>7} tasks  build {build_ms:7.1f} ms  scan {scan_us:9.1f} us/lookup  index {index_us:8.1f} us/lookup")
+        for query in queries:
+            print(f"          {query!r:<24} scan {time_per_call(lambda q: legacy_find(tasks, q), [query], args.rounds):9.1f} us"
+                  f"  index {time_per_call(index.best, [query], args.rounds):8.1f} us  -> {index.best(query)[0].text!r}"
+                  if index.best(query)[0] else f"          {query!r:<24} no match")
@@ -0,0 +1,117 @@
+"""Read latency, bytes downloaded and staleness: full refetch vs TTL cache vs background sync.
+
+    python benchmarks/bench_task_sync.py --tasks 500 --duration 10 --latency 0.03 --interval 1
+
+One reader alternates "show all tasks" and "task number N" against the
+local One List API stub while another client adds a task every
+--write-every seconds. For each strategy:
+
+  full refetch  every read downloads the whole list (no cache, no ETag)
+  ttl cache     the default: the list is cached for --ttl seconds, then
+                revalidated with If-None-Match on the next read
+  sync          TaskSync refreshes the cached list every --interval seconds
+                in the background (a 304 when nothing changed); list and
+                "task number N" reads are answered from it
+
+"stale" is the share of list replies missing a task that was already
+added, and "max age" how long the oldest of those had been there.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_api import start_stub  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+from engine.chat import ChatEngine  # noqa: E402
+from engine.singleflight import SingleFlight  # noqa: E402
+from engine.task_cache import TaskCache  # noqa: E402
+from engine.task_sync import TaskSync  # noqa: E402
+
+TOKEN = "bench"
+
+
+class PlainClient(OneListClient):
+    """OneListClient without conditional requests, so every list read is a full download"""
+
+    list_items_if_changed = None
+
+
+def writer(store, every: float, written: list, stop: threading.Event) -> None:
+    """Add a task every `every` seconds, as another client of the API would"""
+    while not stop.wait(every):
+        store.add(TOKEN, f"added by another client {len(written)}")
+        written.append(time.monotonic())
+
+
+async def run(label: str, client, store, args, ttl: float, interval: float = 0) -> None:
+    task_sync = TaskSync(lambda token: engine.sync_tasks(token), interval=interval) if interval else None
+    engine = ChatEngine(client, task_cache=TaskCache(ttl=ttl), flights=SingleFlight(), task_sync=task_sync)
+    if task_sync is not None:
+        task_sync.start()
+    await engine.handle("show all tasks", TOKEN)
+    task_id = engine.task_cache.stale(TOKEN)[0][0].id
+    calls, sent = store.calls_by_endpoint.copy(), store.bytes_sent
+
+    written, stop = [], threading.Event()
+    thread = threading.Thread(target=writer, args=(store, args.write_every, written, stop), daemon=True)
+    thread.start()
+    latencies, stale, max_age, reads = [], 0, 0.0, 0
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        reads += 1
+        message = "show all tasks" if reads % 2 else f"task number {task_id}"
+        start = time.perf_counter()
+        reply = await engine.handle(message, TOKEN)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        assert reply.success, reply.response
+        if message == "show all tasks":
+            shown = engine.task_cache.stale(TOKEN)[0]
+            missing = args.tasks + len(written) - len(shown)
+            if missing > 0:
+                stale += 1
+                max_age = max(max_age, time.monotonic() - written[-missing])
+        await asyncio.sleep(args.think)
+    stop.set()
+    thread.join()
+    if task_sync is not None:
+        await task_sync.stop()
+    await client.close()
+
+    list_calls = store.calls_by_endpoint.get("GET /items", 0) - calls.get("GET /items", 0)
+    item_calls = store.calls_by_endpoint.get("GET /items/{id}", 0) - calls.get("GET /items/{id}", 0)
+    latencies.sort()
+    print(
+        f"{label:<13} mean {statistics.mean(latencies):6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms  "
+        f"GET /items {list_calls:4d}  GET /items/{{id}} {item_calls:4d}  "
+        f"downloaded {(store.bytes_sent - sent) / 2**20:6.2f} MB  "
+        f"stale {stale / (reads // 2 or 1):5.1%}  max age {max_age:5.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per strategy")
+    parser.add_argument("--latency", type=float, default=0.03, help="stub latency in seconds")
+    parser.add_argument("--think", type=float, default=0.05, help="seconds between reads")
+    parser.add_argument("--write-every", type=float, default=2.0, help="seconds between tasks added by another client")
+    parser.add_argument("--ttl", type=float, default=30.0, help="TASK_CACHE_TTL for the cached strategies")
+    parser.add_argument("--interval", type=float, default=1.0, help="TASK_SYNC_INTERVAL")
+    args = parser.parse_args()
+
+    for label, client_class, ttl, interval in [
+        ("full refetch", PlainClient, 0, 0),
+        ("ttl cache", OneListClient, args.ttl, 0),
+        ("sync", OneListClient, args.ttl, args.interval),
+    ]:
+        # A fresh list per strategy, so each starts from the same --tasks items
+        server, url, store = start_stub(latency=args.latency)
+        store.seed(TOKEN, args.tasks)
+        asyncio.run(run(label, client_class(url), store, args, ttl, interval))
+        server.shutdown()
@@ -0,0 +1,106 @@
+"""Per-message latency and backend CPU: the frontend's old HTTP path vs one /ws/chat connection.
+
+    python benchmarks/bench_websocket.py --messages 500 --tasks 200
+
+A real `uvicorn backend.main:app` runs against the local One List API stub,
+and the same read-mostly conversation is sent three ways:
+
+  http          a new `requests.post` to /chat/stream per message (the old
+                frontend: new TCP connection, headers and JSON every time)
+  http pooled   the same over one keep-alive `requests.Session`
+  websocket     one /ws/chat connection for the whole conversation
+
+Backend CPU per message is read from /proc, so that column needs Linux.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import requests
+from websockets.sync.client import connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_workers import start_backend  # noqa: E402
+from stub_api import start_stub  # noqa: E402
+
+TOKEN = "bench"
+MESSAGES = ["show all tasks", "list incomplete tasks", "show next 10 tasks", "show next", "hello"]
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process so far"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return float("nan")
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def over_http(url: str, session=None):
+    post = session.post if session is not None else requests.post
+
+    def send(message: str) -> str:
+        response = post(f"{url}/chat/stream", json={"message": message, "session_id": "bench"}, stream=True)
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        return "".join(response.iter_content(chunk_size=None, decode_unicode=True))
+
+    return send
+
+
+def over_websocket(socket):
+    def send(message: str) -> str:
+        socket.send(json.dumps({"message": message, "session_id": "bench"}))
+        text = []
+        while True:
+            frame = json.loads(socket.recv())
+            text.append(frame["text"])
+            if frame["done"]:
+                return "".join(text)
+
+    return send
+
+
+def measure(label: str, send, pid: int, total: int) -> None:
+    for message in MESSAGES:
+        send(message)
+    latencies = []
+    cpu = cpu_seconds(pid)
+    for i in range(total):
+        start = time.perf_counter()
+        send(MESSAGES[i % len(MESSAGES)])
+        latencies.append((time.perf_counter() - start) * 1e3)
+    cpu = cpu_seconds(pid) - cpu
+    latencies.sort()
+    print(
+        f"{label:<12} mean {statistics.mean(latencies):6.2f} ms  p50 {latencies[len(latencies) // 2]:6.2f} ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms  backend CPU {cpu / total * 1e6:7.0f} us/message"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks in the stub's list")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency in seconds")
+    args = parser.parse_args()
+
+    server, stub_url, store = start_stub(latency=args.latency)
+    store.seed(TOKEN, args.tasks)
+    env = {**os.environ, "ONE_LIST_API_URL": stub_url, "ACCESS_TOKEN": TOKEN, "SHARED_STATE_URL": ""}
+    process, url = start_backend(1, env)
+    try:
+        measure("http", over_http(url), process.pid, args.messages)
+        measure("http pooled", over_http(url, requests.Session()), process.pid, args.messages)
+        with connect(url.replace("http://", "ws://") + "/ws/chat") as socket:
+            measure("websocket", over_websocket(socket), process.pid, args.messages)
+    finally:
+        process.terminate()
+        process.wait()
+        server.shutdown()
@@ -0,0 +1,104 @@
+"""Throughput of the backend as uvicorn worker processes are added, against the local One List API stub.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 4000 --clients 4
+
+For each worker count a real `uvicorn backend.main:app --workers N` is
+started with its task cache, sessions and single-flight in a shared SQLite
+store (SHARED_STATE_URL), and loaded with load_test.py's mixed workload from
+`--clients` separate processes, so the load generator is not the bottleneck.
+A first "1 local" row runs one worker with in-process state for reference.
+Scaling needs as many free cores as workers plus clients.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import run  # noqa: E402
+from stub_api import start_stub  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def drive(job) -> tuple:
+    """One load-generating process: (requests sent, requests that succeeded)"""
+    url, total, concurrency, users, tasks, seed = job
+
+    async def go():
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=concurrency)) as http:
+            results, _, _ = await run(http, total, concurrency, users, tasks, seed)
+        rows = [ok for rows in results.values() for _, ok in rows]
+        return len(rows), sum(rows)
+
+    return asyncio.run(go())
+
+
+def start_backend(workers: int, env: dict) -> tuple:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"backend with {workers} worker(s) did not start")
+
+
+def measure(label: str, workers: int, env: dict, args, pool) -> None:
+    process, url = start_backend(workers, env)
+    try:
+        per_client = args.requests // args.clients
+        jobs = [(url, per_client, args.concurrency, args.users, args.tasks, seed) for seed in range(args.clients)]
+        # Warm every worker's connection pool and caches before timing
+        pool.map(drive, [(url, 200, args.concurrency, args.users, args.tasks, 99)] * args.clients)
+        start = time.perf_counter()
+        counts = pool.map(drive, jobs)
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    sent, ok = map(sum, zip(*counts))
+    print(f"{label:<8} {sent:6d} requests in {elapsed:6.2f}s -> {sent / elapsed:8.1f} req/s  ({ok / sent:.1%} successful replies)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--clients", type=int, default=4, help="load-generating processes")
+    parser.add_argument("--concurrency", type=int, default=25, help="requests in flight per client")
+    parser.add_argument("--users", type=int, default=20, help="distinct access tokens")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per user in the stub")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub latency in seconds")
+    args = parser.parse_args()
+
+    server, stub_url, _ = start_stub(latency=args.latency, tasks_per_token=args.tasks)
+    env = {**os.environ, "ONE_LIST_API_URL": stub_url, "SHARED_STATE_URL": ""}
+    with tempfile.TemporaryDirectory() as state_dir, multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        measure("1 local", 1, env, args, pool)
+        for workers in args.workers:
+            path = os.path.join(state_dir, f"state-{workers}.sqlite3")
+            measure(f"{workers} shared", workers, {**env, "SHARED_STATE_URL": f"sqlite:///{path}"}, args, pool)
+    server.shutdown()
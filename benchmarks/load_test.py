@@ -0,0 +1,185 @@
+"""End-to-end load test for /chat with a mixed intent workload, runnable offline.
+
+By default everything runs in one process: the One List API stub on a
+local port and the FastAPI app through an in-memory ASGI transport. The
+stub's threads then share the GIL with the app, which inflates tail
+latency; use the second form below for latency numbers you want to quote.
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 50 --users 20 --latency 0.03
+
+To load a separately running backend, start the stub and point the backend at it:
+
+    python benchmarks/stub_api.py --port 9000 --tasks 200 --latency 0.03
+    ONE_LIST_API_URL=http://127.0.0.1:9000 uvicorn backend.main:app --workers 4
+    python benchmarks/load_test.py --backend http://127.0.0.1:8000
+
+Before the run each user gets the tasks its complete and delete messages
+name (through /chat/batch, not timed), and "task {n}" numbers stay within
+the shortest list a session can have shown, so the per-intent rows measure
+successful requests rather than "not found" replies.
+
+Upstream calls per intent come from the backend's own
+chat_upstream_calls_total metric, diffed around the run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_api import start_stub  # noqa: E402
+
+# (intent label, weight, message template); {n} is a task number, {name} a task added for the run
+WORKLOAD = [
+    ("list_tasks", 30, "show all tasks"),
+    ("list_incomplete", 12, "list incomplete tasks"),
+    ("list_complete", 8, "show my completed tasks"),
+    ("list_next", 8, "show next 20 tasks"),
+    ("add_task", 12, "add a task to load test item {n}"),
+    ("complete_task", 10, "mark {name} as done"),
+    ("delete_task", 5, "delete '{name}'"),
+    ("view_task", 8, "task {n}"),
+    ("unknown", 7, "what's the weather like?"),
+]
+# Tasks per user that complete messages pick from; every delete gets a task of its own
+COMPLETE_TARGETS = 10
+UPSTREAM_CALLS = re.compile(r'^chat_upstream_calls_total\{intent="([^"]+)",endpoint="([^"]+)"\} (\S+)$', re.M)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def upstream_calls(metrics_text: str) -> Dict[str, float]:
+    calls: Dict[str, float] = defaultdict(float)
+    for intent, _, value in UPSTREAM_CALLS.findall(metrics_text):
+        calls[intent] += float(value)
+    return calls
+
+
+def make_plan(total: int, users: int, tasks: int, seed: int) -> Tuple[List[Tuple[str, str, str]], Dict[str, List[str]]]:
+    """(label, message, token) for every request, and the task names each token needs beforehand"""
+    rng = random.Random(seed)
+    labels, weights, templates = zip(*WORKLOAD)
+    # Runs sharing tokens (bench_workers.py's clients) must not add the same names: they would be ambiguous
+    run_id = uuid.uuid4().hex[:8]
+    targets: Dict[str, List[str]] = {
+        f"load-user-{u}": [f"load target {run_id} {k}" for k in range(COMPLETE_TARGETS)] for u in range(users)
+    }
+    plan: List[Tuple[str, str, str]] = []
+    for i in range(total):
+        index = rng.choices(range(len(WORKLOAD)), weights)[0]
+        token = f"load-user-{i % users}"
+        if labels[index] == "delete_task":
+            # Deleted once, and never named by a complete that could run after it
+            name = f"load scratch {run_id} {len(targets[token]) - COMPLETE_TARGETS}"
+            targets[token].append(name)
+        else:
+            name = f"load target {run_id} {rng.randrange(COMPLETE_TARGETS)}"
+        # About a third of the seeded tasks are complete: the shortest list a session shows
+        message = templates[index].format(n=rng.randint(1, max(1, tasks // 3)), name=name)
+        plan.append((labels[index], message, token))
+    return plan, targets
+
+
+async def add_targets(http: httpx.AsyncClient, targets: Dict[str, List[str]]) -> None:
+    for token, names in targets.items():
+        requests = [{"message": f"add a task to {name}", "access_token": token} for name in names]
+        replies = (await http.post("/chat/batch", json={"requests": requests})).json()
+        failed = [reply["response"] for reply in replies if not reply["success"]]
+        if failed:
+            raise SystemExit(f"could not add the tasks for {token}: {failed[0]}")
+
+
+async def run(http: httpx.AsyncClient, total: int, concurrency: int, users: int, tasks: int, seed: int):
+    plan, targets = make_plan(total, users, tasks, seed)
+    await add_targets(http, targets)
+
+    results: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+    queue = iter(plan)
+
+    async def worker():
+        for label, message, token in queue:
+            start = time.perf_counter()
+            try:
+                response = await http.post("/chat", json={"message": message, "access_token": token, "session_id": token})
+                body = response.json() if response.status_code == 200 else {}
+                # Group by the intent the backend saw so rows line up with its metrics
+                label, ok = body.get("intent", label), body.get("success", False)
+            except httpx.HTTPError:
+                ok = False
+            results[label].append((time.perf_counter() - start, ok))
+
+    before = upstream_calls((await http.get("/metrics")).text)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = upstream_calls((await http.get("/metrics")).text)
+    return results, elapsed, {k: after[k] - before.get(k, 0.0) for k in after}
+
+
+def report(results, elapsed: float, calls: Dict[str, float]) -> None:
+    everything = [latency for rows in results.values() for latency, _ in rows]
+    print(f"{len(everything)} requests in {elapsed:.2f}s -> {len(everything) / elapsed:.1f} req/s")
+    print(f"{'intent':<16}{'count':>7}{'ok %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'upstream/req':>14}")
+    for label in sorted(results):
+        rows = results[label]
+        latencies = [latency for latency, _ in rows]
+        ok = sum(1 for _, success in rows if success) / len(rows) * 100
+        print(
+            f"{label:<16}{len(rows):>7}{ok:>7.1f}"
+            f"{percentile(latencies, 0.5) * 1e3:>9.1f}{percentile(latencies, 0.95) * 1e3:>9.1f}"
+            f"{percentile(latencies, 0.99) * 1e3:>9.1f}{calls.get(label, 0.0) / len(rows):>14.2f}"
+        )
+    print(
+        f"{'all':<16}{len(everything):>7}{'':>7}{percentile(everything, 0.5) * 1e3:>9.1f}"
+        f"{percentile(everything, 0.95) * 1e3:>9.1f}{percentile(everything, 0.99) * 1e3:>9.1f}"
+        f"{sum(calls.values()) / len(everything):>14.2f}"
+    )
+
+
+async def main(args) -> None:
+    if args.backend:
+        http = httpx.AsyncClient(base_url=args.backend, timeout=60, limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        server, url, store = start_stub(
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, tasks_per_token=args.tasks
+        )
+        os.environ["ONE_LIST_API_URL"] = url
+        from backend import main as app_module
+
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://load-test", timeout=60)
+
+    async with http:
+        results, elapsed, calls = await run(http, args.requests, args.concurrency, args.users, args.tasks, args.seed)
+    report(results, elapsed, calls)
+    if not args.backend:
+        print(f"stub saw {store.calls} calls: {dict(sorted(store.calls_by_endpoint.items()))}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", help="URL of a running backend; default runs the app in-process")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20, help="distinct access tokens")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per user in the stub")
+    parser.add_argument("--latency", type=float, default=0.03, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random stub latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls failing with 503")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,189 @@
+"""Local stand-in for the One List API used by the benchmarks.
+
+Runs on the standard library only so benchmarks work offline, either
+in-process (`start_stub`) or as its own process:
+
+    python benchmarks/stub_api.py --port 9000 --latency 0.05 --jitter 0.02 --error-rate 0.01 --tasks 500
+
+then point the app at it with ONE_LIST_API_URL=http://127.0.0.1:9000.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+ITEM_PATH = re.compile(r"^/items/(\d+)$")
+
+
+class StubStore:
+    """In-memory task lists keyed by access token"""
+
+    def __init__(self, tasks_per_token: int = 0):
+        self.lock = threading.RLock()
+        self.items: Dict[str, Dict[int, Dict]] = {}
+        self.next_id = 1
+        self.calls = 0
+        self.calls_by_endpoint: Dict[str, int] = {}
+        # Response body bytes sent, for comparing how much each strategy downloads
+        self.bytes_sent = 0
+        # New tokens start with this many generated tasks
+        self.tasks_per_token = tasks_per_token
+
+    def tasks(self, token: str) -> Dict[int, Dict]:
+        with self.lock:
+            if token not in self.items:
+                self.items[token] = {}
+                if self.tasks_per_token:
+                    self.seed(token, self.tasks_per_token)
+            return self.items[token]
+
+    def count(self, endpoint: str) -> None:
+        with self.lock:
+            self.calls += 1
+            self.calls_by_endpoint[endpoint] = self.calls_by_endpoint.get(endpoint, 0) + 1
+
+    def sent(self, size: int) -> None:
+        with self.lock:
+            self.bytes_sent += size
+
+    def add(self, token: str, text: str, complete: bool = False) -> Dict:
+        with self.lock:
+            now = datetime.now(timezone.utc).isoformat()
+            item = {
+                "id": self.next_id,
+                "text": text,
+                "complete": complete,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self.items.setdefault(token, {})[self.next_id] = item
+            self.next_id += 1
+            return item
+
+    def seed(self, token: str, count: int) -> None:
+        """Fill a token's list with `count` generated tasks"""
+        for i in range(count):
+            self.add(token, f"task {i} buy groceries item {i % 97}", complete=i % 3 == 0)
+
+
+def make_handler(store: StubStore, latency: float, jitter: float = 0.0, error_rate: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid the Nagle/delayed-ACK stall on keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body=None, etag: str = None):
+            payload = b"" if body is None else json.dumps(body).encode()
+            if etag is None and status == 200 and self.command == "GET":
+                # Weak ETag over the body, answered with 304 on a matching If-None-Match (as Rails does)
+                etag = f'W/"{hashlib.md5(payload).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, etag=etag)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(payload)
+            store.sent(len(payload))
+
+        def _read_json(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _route(self, method: str):
+            url = urlparse(self.path)
+            store.count(f"{method} {ITEM_PATH.sub('/items/{id}', url.path)}")
+            delay = latency + (random.uniform(0, jitter) if jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+            if error_rate and random.random() < error_rate:
+                if method in ("POST", "PUT"):
+                    self._read_json()
+                return self._send(503, {"error": "injected failure"})
+
+            token = parse_qs(url.query).get("access_token", [""])[0]
+            if not token:
+                return self._send(401, {"error": "missing access_token"})
+            tasks = store.tasks(token)
+
+            if url.path == "/items":
+                if method == "GET":
+                    return self._send(200, list(tasks.values()))
+                if method == "POST":
+                    return self._send(201, store.add(token, self._read_json()["text"]))
+
+            match = ITEM_PATH.match(url.path)
+            if match:
+                item = tasks.get(int(match.group(1)))
+                if item is None:
+                    return self._send(404, {"error": "not found"})
+                if method == "GET":
+                    return self._send(200, item)
+                if method == "PUT":
+                    item.update(self._read_json())
+                    item["updated_at"] = datetime.now(timezone.utc).isoformat()
+                    return self._send(200, item)
+                if method == "DELETE":
+                    del tasks[item["id"]]
+                    return self._send(204)
+
+            return self._send(404, {"error": "not found"})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def do_PUT(self):
+            self._route("PUT")
+
+        def do_DELETE(self):
+            self._route("DELETE")
+
+    return Handler
+
+
+def start_stub(
+    port: int = 0,
+    latency: float = 0.0,
+    store: StubStore = None,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    tasks_per_token: int = 0,
+):
+    """Start the stub in a background thread and return (server, base_url, store)"""
+    store = store or StubStore(tasks_per_token)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(store, latency, jitter, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--tasks", type=int, default=0, help="generated tasks for each new token")
+    args = parser.parse_args()
+
+    server, url, _ = start_stub(args.port, args.latency, None, args.jitter, args.error_rate, args.tasks)
+    print(f"One List API stub running at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,553 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from engine.circuit_breaker import CircuitOpenError
+from engine.intents import MAX_MESSAGE_LENGTH, identify_intent
+from engine.rate_limit import RateLimited
+from engine.sessions import SessionStore
+from engine.task_cache import TaskCache
+from engine.task_index import TaskIndex
+from engine.tasks import Task, tasks_from_rows
+from engine.task_views import (
+    LIST_FILTERS,
+    LIST_INTENTS,
+    PAGE_INTENTS,
+    partition_tasks,
+    render_list,
+    render_page,
+    resolve_page,
+)
+
+# Upstream writes in flight at once for one bulk command
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+# Failed items listed by name in a bulk reply
+BULK_FAILURES_SHOWN = 10
+# How long the numbers of a shown list keep referring to it ("complete 3")
+POSITION_MAP_TTL = float(os.getenv("POSITION_MAP_TTL", "600"))
+
+# Appended to read replies answered from an old cached list, by why the API was not asked
+STALE_NOTES = {
+    CircuitOpenError: "\n\n(The task service is not responding, so this is the last list I fetched.)",
+    RateLimited: "\n\n(You're asking faster than your list can be refreshed, so this is the copy from a moment ago.)",
+}
+
+HELP_TEXT = (
+    "I'm not sure what you want to do. You can:\n\n"
+    "• Add a task: 'Add a task to buy milk'\n"
+    "• List tasks: 'Show all tasks'\n"
+    "• View a task: 'Task 2' (its number in the last list)\n"
+    "• Complete a task: 'Mark buy milk as done' or 'Complete 3' (its number in the last list)\n"
+    "• Delete a task: 'Delete buy milk' or 'Delete 3'\n"
+    "• Bulk changes: 'Delete all completed tasks', 'Mark everything with groceries done'"
+)
+
+
+class Reply(NamedTuple):
+    response: str
+    intent: str
+    success: bool
+
+
+class Command(NamedTuple):
+    """One parsed chat message plus what its handler needs to run it"""
+
+    intent: str
+    params: Optional[tuple]
+    token: str
+    snapshot: Optional[List[Task]]
+    session_id: Optional[str]
+
+
+def _untimed(intent: str, stage: str):
+    return nullcontext()
+
+
+def describe_error(e: Exception) -> str:
+    if isinstance(e, CircuitOpenError):
+        return f"The task service is not responding. Please try again in {math.ceil(e.retry_after)} seconds."
+    if isinstance(e, RateLimited):
+        return f"You're sending requests too quickly. Please try again in {math.ceil(e.retry_after)} seconds."
+    response = getattr(e, "response", None)
+    if response is not None:
+        return f"API Error: {response.status_code} - {response.text}"
+    return f"Error: {str(e)}"
+
+
+class ChatEngine:
+    """Intent handling shared by the FastAPI backend and the Streamlit app.
+
+    `client` is any object with the async One List API methods of
+    `backend.upstream.OneListClient` (`list_items`, `get_item`, `create_item`,
+    `update_item`, `delete_item`, and optionally `list_items_if_changed` for
+    conditional list fetches), returning items as `engine.tasks.Task`
+    (see `decode_tasks`); HTTP errors are expected to carry a
+    `response` with `status_code` and `text`, as both httpx and requests do.
+    While the client raises `CircuitOpenError`, read intents are answered
+    from the last cached list, however old, and writes fail fast.
+    `flights` (a `SingleFlight`), `write_behind`, `upstream_budget` (a
+    `TokenBucket` charged per upstream read and token; reads over it are
+    answered from the cache like above) and `task_sync` (a `TaskSync` that
+    keeps the lists of active tokens fresh, also used to answer `view_task`
+    from the cached list) are optional, and
+    `stage_timer(intent, stage)` returns a context manager timing a stage.
+    """
+
+    def __init__(
+        self,
+        client,
+        task_cache: Optional[TaskCache] = None,
+        sessions: Optional[SessionStore] = None,
+        flights=None,
+        write_behind=None,
+        upstream_budget=None,
+        task_sync=None,
+        stage_timer: Callable = _untimed,
+    ):
+        self.client = client
+        self.task_cache = task_cache if task_cache is not None else TaskCache()
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.flights = flights
+        self.write_behind = write_behind
+        self.upstream_budget = upstream_budget
+        self.task_sync = task_sync
+        self.stage_timer = stage_timer
+        # Replies to reads over the upstream budget: answered from the cache, or refused
+        self.over_budget_cached = 0
+        self.over_budget_rejected = 0
+        self.handlers: Dict[str, Callable[[Command], Awaitable[Reply]]] = {
+            "message_too_long": self.message_too_long,
+            "add_task": self.add_task,
+            "view_task": self.view_task,
+            "complete_task": self.complete_task,
+            "delete_task": self.delete_task,
+            "complete_all": self.complete_all,
+            "delete_all": self.delete_all,
+        }
+        self.handlers.update(dict.fromkeys(LIST_INTENTS, self.list_tasks))
+        self.handlers.update(dict.fromkeys(PAGE_INTENTS, self.list_page))
+
+    async def handle(
+        self,
+        message: str,
+        token: str,
+        snapshot: Optional[List[Task]] = None,
+        session_id: Optional[str] = None,
+    ) -> Reply:
+        """Identify the intent of a message and run it"""
+        intent, params = identify_intent(message)
+        return await self.dispatch(intent, params, token, snapshot, session_id)
+
+    async def dispatch(
+        self,
+        intent: str,
+        params: Optional[tuple],
+        token: str,
+        snapshot: Optional[List[Task]] = None,
+        session_id: Optional[str] = None,
+        raise_errors: bool = False,
+    ) -> Reply:
+        """Run the handler for an identified intent.
+
+        `snapshot` is a pre-fetched task list to resolve names against.
+        `session_id` keys per-session state such as paging cursors; without
+        one the state is shared by everyone using the same token.
+        A failure is answered with an error reply, or re-raised with
+        `raise_errors` for callers that handle it by type.
+        """
+        handler = self.handlers.get(intent)
+        if handler is None:
+            return Reply(HELP_TEXT, intent, False)
+        try:
+            if token:
+                await self.task_cache.pull(token)
+            return await handler(Command(intent, params, token, snapshot, session_id))
+        except Exception as e:
+            if isinstance(e, RateLimited):
+                self.over_budget_rejected += 1
+            if raise_errors:
+                raise
+            return Reply(describe_error(e), intent, False)
+        finally:
+            await self.task_cache.push()
+
+    async def get_all_tasks(self, token: str) -> List[Task]:
+        """Fetch all tasks, served from the per-token cache when fresh"""
+        if self.task_sync is not None:
+            self.task_sync.touch(token)
+        await self.task_cache.pull(token)
+        tasks = self.task_cache.get(token)
+        if tasks is not None:
+            return tasks
+        try:
+            return await self._shared((token, "GET /items"), lambda: self._refetch(token), tasks_from_rows)
+        finally:
+            await self.task_cache.push()
+
+    async def sync_tasks(self, token: str) -> bool:
+        """Refetch a token's list into the cache even if it is fresh; True if the list changed"""
+        await self.task_cache.pull(token)
+        before, _ = self.task_cache.stale(token)
+        try:
+            tasks = await self._shared((token, "GET /items"), lambda: self._refetch(token), tasks_from_rows)
+        finally:
+            await self.task_cache.push()
+        return tasks != before
+
+    async def _refetch(self, token: str) -> List[Task]:
+        started = time.monotonic()
+        fetched, etag = await self._budgeted(token, lambda: self._fetch_if_changed(token))
+        if fetched is None:
+            tasks = self.task_cache.revalidate(token)
+            if tasks is not None:
+                return tasks
+            started = time.monotonic()
+            fetched, etag = await self.client.list_items(token), None
+        if self.write_behind is not None:
+            fetched = self.write_behind.overlay(token, fetched, started)
+        return self.task_cache.set(token, fetched, etag)
+
+    async def _fetch_if_changed(self, token: str) -> Tuple[Optional[List[Task]], Optional[str]]:
+        """Return (tasks, etag), or (None, etag) when the API says the expired cached list is still current"""
+        conditional = getattr(self.client, "list_items_if_changed", None)
+        if conditional is None:
+            return await self.client.list_items(token), None
+        _, etag = self.task_cache.stale(token)
+        return await conditional(token, etag)
+
+    def rendered_list(self, token: str, intent: str, tasks: List[Task]) -> str:
+        """Reply text for a list intent, rendered once per cached snapshot"""
+
+        def render(tasks: List[Task]) -> str:
+            return "".join(render_list(intent, self.get_partitions(token, tasks)[intent]))
+
+        return self.task_cache.derived(token, tasks, f"render:{intent}", render)
+
+    def get_partitions(self, token: str, tasks: List[Task]) -> Dict[str, List[Task]]:
+        """Tasks split by completion status, computed once per cached snapshot"""
+        return self.task_cache.derived(token, tasks, "partitions", partition_tasks)
+
+    def list_positions(self, token: str, list_intent: str, tasks: List[Task]) -> Dict:
+        """Session entry mapping the numbers of a shown list to task ids; the id list is built once per snapshot"""
+        ids = self.task_cache.derived(
+            token, tasks, f"ids:{list_intent}", lambda _: [t.id for t in self.get_partitions(token, tasks)[list_intent]]
+        )
+        return {"ids": ids, "at": time.time()}
+
+    async def remember_list(self, session_id: Optional[str], token: str, list_intent: str, tasks: List[Task]) -> None:
+        """Let "complete 3" / "delete 3" refer to this list from now on.
+
+        Only within a session: clients sharing a token without one would
+        otherwise number their tasks by whatever list another client saw last.
+        """
+        if session_id is None:
+            return
+        session = await self.sessions.get(session_id)
+        session["positions"] = self.list_positions(token, list_intent, tasks)
+        await self.sessions.save(session_id, session)
+
+    def get_task_index(self, token: str, tasks: List[Task]) -> TaskIndex:
+        """Search index for a task snapshot, built once per cached snapshot"""
+        return self.task_cache.derived(token, tasks, "index", TaskIndex)
+
+    async def message_too_long(self, cmd: Command) -> Reply:
+        return Reply(
+            f"That message is too long ({cmd.params[0]} characters). Please keep it under {MAX_MESSAGE_LENGTH}.",
+            cmd.intent,
+            False,
+        )
+
+    async def add_task(self, cmd: Command) -> Reply:
+        task_name = cmd.params[0].strip() if cmd.params else None
+        if not task_name:
+            return Reply("Please specify a task name.", cmd.intent, False)
+
+        if self.write_behind is not None:
+            task = self.write_behind.add(cmd.token, task_name)
+        else:
+            task = await self.client.create_item(cmd.token, task_name)
+        self.task_cache.add_task(cmd.token, task)
+        return Reply(f"✓ Task created: \"{task.text}\"", cmd.intent, True)
+
+    async def list_tasks(self, cmd: Command) -> Reply:
+        tasks, note = await self._read_snapshot(cmd)
+        with self.stage_timer(cmd.intent, "format"):
+            text = self.rendered_list(cmd.token, cmd.intent, tasks)
+        await self.remember_list(cmd.session_id, cmd.token, cmd.intent, tasks)
+        return Reply(text + note, cmd.intent, True)
+
+    async def list_page(self, cmd: Command) -> Reply:
+        session_key = cmd.session_id or cmd.token
+        session = await self.sessions.get(session_key)
+        list_intent, start, size = resolve_page(cmd.intent, cmd.params, session.get("cursor"))
+        tasks, note = await self._read_snapshot(cmd)
+        items = self.get_partitions(cmd.token, tasks)[list_intent]
+        session["cursor"] = {"intent": list_intent, "offset": start + size, "size": size}
+        if cmd.session_id is not None:
+            session["positions"] = self.list_positions(cmd.token, list_intent, tasks)
+        await self.sessions.save(session_key, session)
+        with self.stage_timer(cmd.intent, "format"):
+            text = self.task_cache.derived(
+                cmd.token,
+                tasks,
+                f"page:{list_intent}:{start}:{size}",
+                lambda _: "".join(render_page(list_intent, items, start, size)),
+            )
+        return Reply(text + note, cmd.intent, True)
+
+    async def view_task(self, cmd: Command) -> Reply:
+        position = cmd.params[0] if cmd.params else None
+        if not position:
+            return Reply("Please specify a task number.", cmd.intent, False)
+
+        # Numbered like "complete 3": a position in the list last shown
+        task_id, problem, note = await self._resolve_position(cmd, int(position), stale_ok=True)
+        if problem is not None:
+            return problem
+        task = self._cached_task(cmd.token, task_id)
+        if task is None:
+            task, fetch_note = await self._fetch_task(cmd.token, task_id)
+            note = note or fetch_note
+        status = "✓ Completed" if task.complete else "○ Incomplete"
+        text = f"Task #{position}:\n\nName: {task.text}\nStatus: {status}"
+        return Reply(text + note, cmd.intent, True)
+
+    async def complete_task(self, cmd: Command) -> Reply:
+        task_id, problem = await self._resolve_task(cmd, "complete")
+        if problem is not None:
+            return problem
+
+        if self.write_behind is not None:
+            self.write_behind.complete(cmd.token, task_id)
+        else:
+            await self.client.update_item(cmd.token, task_id, complete=True)
+        self.task_cache.update_task(cmd.token, task_id, complete=True)
+        return Reply("✓ Task marked as complete!", cmd.intent, True)
+
+    async def delete_task(self, cmd: Command) -> Reply:
+        task_id, problem = await self._resolve_task(cmd, "delete")
+        if problem is not None:
+            return problem
+
+        if self.write_behind is not None:
+            self.write_behind.delete(cmd.token, task_id)
+        else:
+            await self.client.delete_item(cmd.token, task_id)
+        self.task_cache.remove_task(cmd.token, task_id)
+        return Reply("✓ Task deleted successfully!", cmd.intent, True)
+
+    async def complete_all(self, cmd: Command) -> Reply:
+        tasks = [t for t in await self._select_tasks(cmd) if not t.complete]
+        if not tasks:
+            return Reply("No matching incomplete tasks.", cmd.intent, False)
+
+        async def complete(task: Task) -> None:
+            if self.write_behind is not None:
+                self.write_behind.complete(cmd.token, task.id)
+            else:
+                await self.client.update_item(cmd.token, task.id, complete=True)
+
+        done, failed = await self._run_bulk(tasks, complete)
+        self.task_cache.update_tasks(cmd.token, [t.id for t in done], complete=True)
+        return self._bulk_reply(cmd, "marked as complete", len(tasks), failed)
+
+    async def delete_all(self, cmd: Command) -> Reply:
+        if not any(cmd.params or ()):
+            # "delete all" / "clear everything" would wipe the list in one message with no way back
+            return Reply(
+                "Say which tasks to delete, e.g. 'delete all completed tasks' or 'delete all tasks with groceries'.",
+                cmd.intent,
+                False,
+            )
+        tasks = await self._select_tasks(cmd)
+        if not tasks:
+            return Reply("No matching tasks.", cmd.intent, False)
+
+        async def delete(task: Task) -> None:
+            if self.write_behind is not None:
+                self.write_behind.delete(cmd.token, task.id)
+            else:
+                await self.client.delete_item(cmd.token, task.id)
+
+        done, failed = await self._run_bulk(tasks, delete)
+        self.task_cache.remove_tasks(cmd.token, [t.id for t in done])
+        return self._bulk_reply(cmd, "deleted", len(tasks), failed)
+
+    async def _select_tasks(self, cmd: Command) -> List[Task]:
+        """Tasks a bulk command applies to: an optional status filter and an optional "containing" text"""
+        status, text = (tuple(cmd.params or ()) + (None, None))[:2]
+        tasks = await self._snapshot(cmd)
+        if text:
+            tasks = self.get_task_index(cmd.token, tasks).containing(text)
+        list_intent = LIST_FILTERS.get(status) if status else None
+        if list_intent == "list_complete":
+            tasks = [t for t in tasks if t.complete]
+        elif list_intent == "list_incomplete":
+            tasks = [t for t in tasks if not t.complete]
+        return tasks
+
+    async def _run_bulk(
+        self, tasks: List[Task], call: Callable[[Task], Awaitable[None]]
+    ) -> Tuple[List[Task], List[Tuple[Task, Exception]]]:
+        """Run `call` for every task, at most BULK_CONCURRENCY at a time; returns (done, [(task, error)])"""
+        limit = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def run(task: Task) -> None:
+            async with limit:
+                await call(task)
+
+        results = await asyncio.gather(*(run(t) for t in tasks), return_exceptions=True)
+        done = [t for t, result in zip(tasks, results) if not isinstance(result, Exception)]
+        failed = [(t, result) for t, result in zip(tasks, results) if isinstance(result, Exception)]
+        return done, failed
+
+    def _bulk_reply(self, cmd: Command, action: str, total: int, failed: List[Tuple[Task, Exception]]) -> Reply:
+        if not failed:
+            return Reply(f"✓ {total} task(s) {action}!", cmd.intent, True)
+        lines = "\n".join(f"• {t.text}: {describe_error(e)}" for t, e in failed[:BULK_FAILURES_SHOWN])
+        if len(failed) > BULK_FAILURES_SHOWN:
+            lines += f"\n• ...and {len(failed) - BULK_FAILURES_SHOWN} more"
+        return Reply(
+            f"{total - len(failed)} of {total} task(s) {action}. {len(failed)} failed:\n\n{lines}",
+            cmd.intent,
+            False,
+        )
+
+    async def _resolve_task(self, cmd: Command, verb: str) -> Tuple[Any, Optional[Reply]]:
+        """Return (task id, None), or (None, reply) when the task is missing or ambiguous"""
+        identifier = cmd.params[0].strip() if cmd.params else None
+        if not identifier:
+            return None, Reply(f"Please specify which task to {verb}.", cmd.intent, False)
+
+        # A number is a position in the list last shown, anything else a name
+        if identifier.isdigit():
+            task_id, problem, _ = await self._resolve_position(cmd, int(identifier))
+            return task_id, problem
+        tasks = await self._snapshot(cmd)
+        index = self.get_task_index(cmd.token, tasks)
+        task, rivals = index.best(identifier)
+        if rivals:
+            options = "\n".join(f"• {t.text}" for t in [task] + rivals)
+            return None, Reply(
+                f"'{identifier}' matches several tasks:\n\n{options}\n\nPlease be more specific.", cmd.intent, False
+            )
+        if not task:
+            suggestions = index.suggest(identifier)
+            if suggestions:
+                options = "\n".join(f"• {t.text}" for t in suggestions)
+                return None, Reply(
+                    f"Task '{identifier}' not found. Did you mean:\n\n{options}\n\nSay it again with the full name.",
+                    cmd.intent,
+                    False,
+                )
+            return None, Reply(f"Task '{identifier}' not found.", cmd.intent, False)
+        return task.id, None
+
+    async def _resolve_position(
+        self, cmd: Command, position: int, stale_ok: bool = False
+    ) -> Tuple[Any, Optional[Reply], str]:
+        """Task id for a number as shown in the session's last list.
+
+        Returns (task id, None, note), or (None, reply, "") when there is no
+        such task. The ids remembered when that list was shown answer without
+        an upstream read; without a session or a recent list the snapshot is
+        fetched, numbered as "show all tasks" would number it. With
+        `stale_ok` (reads) that fetch may fall back to the last cached list,
+        and note is the line saying so.
+        """
+        shown = (await self.sessions.get(cmd.session_id)).get("positions") if cmd.session_id is not None else None
+        note = ""
+        if shown is not None and time.time() - shown["at"] < POSITION_MAP_TTL:
+            ids = shown["ids"]
+        else:
+            tasks, note = await self._read_snapshot(cmd) if stale_ok else (await self._snapshot(cmd), "")
+            ids = self.list_positions(cmd.token, "list_tasks", tasks)["ids"]
+        if not 1 <= position <= len(ids):
+            return None, Reply(f"There is no task {position} in your list.", cmd.intent, False), ""
+        task_id = ids[position - 1]
+        if self.write_behind is not None:
+            # The list may have been shown before one of its local tasks synced
+            task_id = self.write_behind.current_id(task_id)
+        # A fresh cached list, when there is one, shows whether the task was deleted since
+        cached = self.task_cache.get(cmd.token)
+        if cached is not None and str(task_id) not in self.task_cache.derived(
+            cmd.token, cached, "id_set", lambda tasks: {str(t.id) for t in tasks}
+        ):
+            return None, Reply(
+                f"Task {position} from your last list no longer exists. Say 'show all tasks' to see the current list.",
+                cmd.intent,
+                False,
+            ), ""
+        return task_id, None, note
+
+    def _cached_task(self, token: str, task_id) -> Optional[Task]:
+        """A task from the fresh cached list, or None to ask the API.
+
+        Only while TaskSync keeps the list current, or with write-behind,
+        where the list holds tasks the API does not have yet.
+        """
+        if self.task_sync is None and self.write_behind is None:
+            return None
+        if self.task_sync is not None:
+            self.task_sync.touch(token)
+        tasks = self.task_cache.get(token)
+        if tasks is None:
+            return None
+        by_id = self.task_cache.derived(token, tasks, "by_id", lambda tasks: {str(t.id): t for t in tasks})
+        return by_id.get(str(task_id))
+
+    async def _fetch_task(self, token: str, task_id) -> Tuple[Task, str]:
+        """(task, note) from GET /items/{id}, or from the last cached list when the API is cut off or over budget"""
+        try:
+            task = await self._shared(
+                (token, f"GET /items/{task_id}"),
+                lambda: self._budgeted(token, lambda: self.client.get_item(token, task_id)),
+                Task._make,
+            )
+            return task, ""
+        except tuple(STALE_NOTES) as e:
+            tasks, _ = self.task_cache.stale(token)
+            task = next((t for t in tasks or () if str(t.id) == str(task_id)), None)
+            if task is None:
+                raise
+            return task, self._stale_note(e)
+
+    async def _snapshot(self, cmd: Command) -> List[Task]:
+        return cmd.snapshot if cmd.snapshot is not None else await self.get_all_tasks(cmd.token)
+
+    async def _read_snapshot(self, cmd: Command) -> Tuple[List[Task], str]:
+        """Like `_snapshot`, but falls back to the last cached list when the API is cut off or over budget.
+
+        Returns (tasks, note), where note is "" or the line to append to the reply.
+        """
+        try:
+            return await self._snapshot(cmd), ""
+        except tuple(STALE_NOTES) as e:
+            tasks, _ = self.task_cache.stale(cmd.token)
+            if tasks is None:
+                raise
+            return tasks, self._stale_note(e)
+
+    def _stale_note(self, e: Exception) -> str:
+        if isinstance(e, RateLimited):
+            self.over_budget_cached += 1
+        return STALE_NOTES[type(e)]
+
+    async def _budgeted(self, token: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an upstream read, charged to the token's upstream budget"""
+        if self.upstream_budget is not None:
+            retry_after = await self.upstream_budget.take(token)
+            if retry_after:
+                raise RateLimited(retry_after)
+        return await call()
+
+    async def _shared(
+        self, key: Hashable, call: Callable[[], Awaitable[Any]], decode: Optional[Callable[[Any], Any]] = None
+    ) -> Any:
+        # Without a SingleFlight (e.g. one event loop per call) every caller runs its own request
+        if self.flights is None:
+            return await call()
+        return await self.flights.do(key, call, decode)
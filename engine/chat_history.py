@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from engine.shared_state import SharedStore, open_shared_store
+
+# Messages a Streamlit session keeps in memory and renders on every rerun
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "50"))
+# Older messages are paged out this many at a time, and "Load earlier messages" brings back one page
+HISTORY_PAGE = int(os.getenv("CHAT_HISTORY_PAGE", "50"))
+# Paged-out messages of an abandoned session expire after this many seconds
+HISTORY_TTL = float(os.getenv("CHAT_HISTORY_TTL", "86400"))
+# Where paged-out messages live; any SHARED_STATE_URL form works
+HISTORY_STORE_URL = os.getenv(
+    "CHAT_HISTORY_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "one-list-chat-history.sqlite3")
+)
+
+
+def open_history_store(url: str = HISTORY_STORE_URL) -> Optional[SharedStore]:
+    """Store for paged-out chat history; one per process, shared by every user session"""
+    return open_shared_store(url)
+
+
+class ChatHistory:
+    """Messages of one chat session: the latest ones in memory, older ones paged out to a store.
+
+    `recent` never holds more than `window + page_size` messages; once it
+    would, its oldest `page_size` are written to `store` as the next page.
+    Pages are numbered from 0 (the oldest) and read back only when the user
+    asks for them, so a rerun renders and keeps a bounded number of messages
+    however long the conversation gets. Without a store the oldest page is
+    dropped instead.
+    """
+
+    def __init__(
+        self,
+        store: Optional[SharedStore],
+        session_id: str,
+        window: int = HISTORY_WINDOW,
+        page_size: int = HISTORY_PAGE,
+        ttl: float = HISTORY_TTL,
+    ):
+        self.store = store
+        self.session_id = session_id
+        self.window = window
+        self.page_size = page_size
+        self.ttl = ttl
+        self.recent: List[Dict] = []
+        self.pages = 0
+        # Paged-out pages currently shown above `recent`, counted from the newest
+        self.shown_pages = 0
+
+    def __len__(self) -> int:
+        return self.pages * self.page_size + len(self.recent)
+
+    def append(self, role: str, content: str) -> None:
+        self.recent.append({"role": role, "content": content})
+        if len(self.recent) >= self.window + self.page_size:
+            page, self.recent = self.recent[:self.page_size], self.recent[self.page_size:]
+            if self.store is not None:
+                self.store.set(self._key(self.pages), json.dumps(page).encode(), self.ttl)
+            self.pages += 1
+
+    def has_earlier(self) -> bool:
+        return self.store is not None and self.shown_pages < self.pages
+
+    def show_earlier(self) -> None:
+        self.shown_pages = min(self.shown_pages + 1, self.pages)
+
+    def show_latest(self) -> None:
+        self.shown_pages = 0
+
+    def visible(self) -> List[Dict]:
+        """Messages to render: the shown pages read back from the store, then `recent`"""
+        messages: List[Dict] = []
+        if self.store is not None:
+            for number in range(self.pages - self.shown_pages, self.pages):
+                page = self.store.get(self._key(number))
+                # An expired page is skipped; the messages after it still make sense on their own
+                if page is not None:
+                    messages.extend(json.loads(page))
+        return messages + self.recent
+
+    def clear(self) -> None:
+        if self.store is not None:
+            for number in range(self.pages):
+                self.store.delete(self._key(number))
+        self.recent = []
+        self.pages = 0
+        self.shown_pages = 0
+
+    def _key(self, number: int) -> str:
+        return f"history:{self.session_id}:{number}"
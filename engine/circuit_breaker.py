@@ -0,0 +1,91 @@
+import os
+import time
+from typing import Dict, Optional
+
+# Consecutive failures that open a breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+# Retry hint for calls refused while a half-open breaker's probe is in flight
+BREAKER_PROBE_RETRY = 1.0
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"{endpoint} is unavailable, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures instead of queueing behind them.
+
+    Closed: calls go through and consecutive failures are counted. Open:
+    calls are refused with `CircuitOpenError` for `reset_timeout` seconds.
+    Half-open (after that): one call goes through as a probe and the rest
+    are refused until it finishes, so a still-down API costs one timeout
+    rather than one per queued request. Its success closes the breaker, its
+    failure opens it for another period; a probe abandoned without an answer
+    (`record_abandoned`) lets the next call probe instead.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> bool:
+        """Raise `CircuitOpenError` if the breaker is open, or half-open with its probe in flight.
+
+        Returns True when the call about to be made is the half-open probe.
+        """
+        if self.opened_at is None:
+            return False
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0:
+            self.rejected += 1
+            raise CircuitOpenError(self.endpoint, remaining)
+        if self.probing:
+            self.rejected += 1
+            raise CircuitOpenError(self.endpoint, BREAKER_PROBE_RETRY)
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_abandoned(self) -> None:
+        """The probe ended without telling whether the API is healthy, e.g. it was cancelled"""
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.probing = False
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed half-open call re-opens immediately
+            self.opened_at = time.monotonic()
+            self.opens += 1
+
+    def stats(self) -> Dict:
+        return {"state": self.state, "failures": self.failures, "opens": self.opens, "rejected": self.rejected}
@@ -0,0 +1,101 @@
+import os
+import time
+from typing import Dict, Hashable
+
+# Chat messages per second per access token (0 turns the limit off) and the burst allowed on top
+CHAT_RATE_LIMIT = float(os.getenv("CHAT_RATE_LIMIT", "0"))
+CHAT_RATE_BURST = int(os.getenv("CHAT_RATE_BURST", "20"))
+# One List API reads per second per access token; reads over it are answered from the cache
+UPSTREAM_BUDGET = float(os.getenv("UPSTREAM_BUDGET", "0"))
+UPSTREAM_BUDGET_BURST = int(os.getenv("UPSTREAM_BUDGET_BURST", "5"))
+# Full buckets are forgotten every this many decisions; a new bucket starts full anyway
+SWEEP_EVERY = 4096
+
+
+class RateLimited(Exception):
+    """Raised when a token is over its limit"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Per-key token buckets refilled at `rate` per second, holding at most `burst`.
+
+    A bucket is one (tokens, updated_at) tuple replaced with a single dict
+    assignment, so deciding takes no lock: on the event loop thread it is
+    exact, and racing threads can at worst let an extra call through.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Hashable, tuple] = {}
+        self.allowed = 0
+        self.rejected = 0
+
+    async def take(self, key: Hashable) -> float:
+        """Spend one token; returns 0.0 if allowed, else the seconds until a token is available.
+
+        A coroutine only to match SharedRateLimiter; it never waits.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if (self.allowed + self.rejected) % SWEEP_EVERY == SWEEP_EVERY - 1:
+            self._sweep(now)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            self.allowed += 1
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        self.rejected += 1
+        return (1 - tokens) / self.rate
+
+    def stats(self) -> Dict:
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._buckets), "allowed": self.allowed, "rejected": self.rejected}
+
+    def _sweep(self, now: float) -> None:
+        full = [k for k, (tokens, at) in list(self._buckets.items()) if tokens + (now - at) * self.rate >= self.burst]
+        for key in full:
+            self._buckets.pop(key, None)
+
+
+class SharedRateLimiter:
+    """Limit shared by worker processes through a `SharedStore`.
+
+    The store only offers an expiring counter, so this is a fixed window of
+    `burst / rate` seconds allowing `burst` calls: the same long-run rate
+    as TokenBucket, with bursts of up to twice `burst` across a window edge.
+    """
+
+    def __init__(self, store, name: str, rate: float, burst: int):
+        self.store = store
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.window = burst / rate
+        self.allowed = 0
+        self.rejected = 0
+
+    async def take(self, key: Hashable) -> float:
+        now = time.time()
+        window = int(now // self.window)
+        if await self.store.aincr(f"rate:{self.name}:{key}:{window}", self.window) <= self.burst:
+            self.allowed += 1
+            return 0.0
+        self.rejected += 1
+        return (window + 1) * self.window - now
+
+    def stats(self) -> Dict:
+        return {"rate": self.rate, "burst": self.burst, "allowed": self.allowed, "rejected": self.rejected}
+
+
+def make_limiter(name: str, rate: float, burst: int, store=None):
+    """Limiter for `rate` calls per second per key, shared through `store` if given; None when `rate` is 0"""
+    if rate <= 0:
+        return None
+    if store is not None:
+        return SharedRateLimiter(store, name, rate, burst)
+    return TokenBucket(rate, burst)
@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+
+class SessionStore:
+    """Small per-session state dicts (list cursors and the like) with idle expiry and an LRU cap.
+
+    The methods are coroutines so SharedSessionStore can reach its store
+    without blocking the event loop; here they never wait.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Dict:
+        """Return the state dict for a session, creating an empty one if needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                entry = (0.0, {})
+            self._entries[key] = (now + self.ttl, entry[1])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry[1]
+
+    async def save(self, key: str, state: Dict) -> None:
+        """Persist changes to a state dict; the dicts here are live, so there is nothing to do"""
+
+    async def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SharedSessionStore(SessionStore):
+    """Session state kept as JSON in a `SharedStore`, so any worker process can continue a session.
+
+    `get` returns a copy; callers write their changes back with `save`.
+    """
+
+    def __init__(self, store, ttl: float = SESSION_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Dict:
+        blob = await self.store.aget(f"session:{key}")
+        return json.loads(blob) if blob is not None else {}
+
+    async def save(self, key: str, state: Dict) -> None:
+        await self.store.aset(f"session:{key}", json.dumps(state).encode(), self.ttl)
+
+    async def discard(self, key: str) -> None:
+        await self.store.adelete(f"session:{key}")
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+# Where state shared by worker processes lives; empty keeps everything in-process.
+# "sqlite:///path/to/file.sqlite3" for workers on one host, "redis://host:6379/0" otherwise
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+# Expired rows are swept from the SQLite store every this many writes
+SQLITE_SWEEP_EVERY = 1000
+
+
+class SharedStore(ABC):
+    """Byte values with optional expiry, visible to every worker process.
+
+    The task cache, single-flight and session store use this small interface
+    to share their state; `ttl` is in seconds and None means no expiry.
+
+    Code running on an event loop uses the async methods (`aget`, `aset`,
+    ...). By default they call the blocking ones directly, which suits a
+    store that does not wait on the network; RedisStore overrides them so a
+    round trip never blocks the loop. The blocking methods are for
+    synchronous callers such as the Streamlit apps.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set `key` only if it is missing or expired; True if this call set it"""
+
+    @abstractmethod
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Add one to a counter and return it; a new counter expires after `ttl`"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.set(key, value, ttl)
+
+    async def aadd(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return self.add(key, value, ttl)
+
+    async def aincr(self, key: str, ttl: Optional[float] = None) -> int:
+        return self.incr(key, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+class SQLiteStore(SharedStore):
+    """Shared state in a SQLite file, for several workers on one host.
+
+    Calls are local and take microseconds, so the async methods run them
+    inline rather than paying for a thread hop on every cache read.
+    """
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+        self.writes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self.db.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, self._expiry(ttl)))
+        self._written()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        cursor = self.db.execute(
+            "INSERT INTO kv VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE"
+            " SET value = excluded.value, expires_at = excluded.expires_at"
+            " WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+            (key, value, self._expiry(ttl), time.time()),
+        )
+        self._written()
+        return cursor.rowcount == 1
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        row = self.db.execute(
+            "INSERT INTO kv VALUES (?, 1, ?) ON CONFLICT(key) DO UPDATE SET"
+            " value = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? THEN 1 ELSE kv.value + 1 END,"
+            " expires_at = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? THEN excluded.expires_at"
+            " ELSE kv.expires_at END"
+            " RETURNING value",
+            (key, self._expiry(ttl), now, now),
+        ).fetchone()
+        self._written()
+        return int(row[0])
+
+    def delete(self, key: str) -> None:
+        self.db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _expiry(self, ttl: Optional[float]) -> Optional[float]:
+        # Wall-clock time: monotonic clocks are not comparable across processes
+        return time.time() + ttl if ttl is not None else None
+
+    def _written(self) -> None:
+        self.writes += 1
+        if self.writes % SQLITE_SWEEP_EVERY == 0:
+            self.db.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+
+class RedisStore(SharedStore):
+    """Shared state in Redis (or a compatible server); needs the optional `redis` package.
+
+    The async methods go through `redis.asyncio`, so the event loop keeps
+    serving other requests during each round trip; the blocking client is
+    only used by synchronous callers.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("SHARED_STATE_URL points at Redis; install it with `pip install redis`") from e
+        # Neither client connects until its first call
+        self.redis = redis.Redis.from_url(url)
+        self.aredis = redis.asyncio.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.redis.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.redis.set(key, value, px=self._ms(ttl))
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.redis.set(key, value, px=self._ms(ttl), nx=True))
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = self.redis.incr(key)
+        if value == 1 and ttl is not None:
+            self.redis.pexpire(key, self._ms(ttl))
+        return value
+
+    def delete(self, key: str) -> None:
+        self.redis.delete(key)
+
+    def close(self) -> None:
+        self.redis.close()
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await self.aredis.get(key)
+
+    async def aset(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self.aredis.set(key, value, px=self._ms(ttl))
+
+    async def aadd(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(await self.aredis.set(key, value, px=self._ms(ttl), nx=True))
+
+    async def aincr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = await self.aredis.incr(key)
+        if value == 1 and ttl is not None:
+            await self.aredis.pexpire(key, self._ms(ttl))
+        return value
+
+    async def adelete(self, key: str) -> None:
+        await self.aredis.delete(key)
+
+    async def aclose(self) -> None:
+        self.redis.close()
+        await self.aredis.aclose()
+
+    def _ms(self, ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+
+def open_shared_store(url: str = SHARED_STATE_URL) -> Optional[SharedStore]:
+    """Store for a SHARED_STATE_URL, or None for in-process state"""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
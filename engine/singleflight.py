@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Longest a worker waits on a call another worker process is running before making it itself
+SHARED_FLIGHT_LEASE = float(os.getenv("SHARED_FLIGHT_LEASE", "10"))
+SHARED_FLIGHT_POLL = 0.01
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls into one in-flight call.
+
+    The first caller for a key runs the call; callers arriving while it is
+    still running await the same future and get its result (or exception).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.issued = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]], decode: Optional[Callable] = None) -> Any:
+        """Run `call` once for concurrent callers with the same key; `decode` is for SharedSingleFlight"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        self.issued += 1
+        future = asyncio.ensure_future(call())
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            future.exception()
+
+    def stats(self) -> Dict:
+        total = self.issued + self.coalesced
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "coalesced_ratio": self.coalesced / total if total else 0.0,
+        }
+
+
+class SharedSingleFlight(SingleFlight):
+    """SingleFlight that also coalesces identical calls across worker processes via a `SharedStore`.
+
+    Within a process calls are coalesced as before. The process that runs a
+    call first takes a lease on its key in the store and publishes the result
+    (which must be JSON-serializable); other processes poll for a result
+    finished after they asked instead of calling too, and get it back
+    through `decode` when given (e.g. tuples come back from JSON as lists). If the lease holder fails
+    or disappears, the next waiter to take the lease runs the call itself.
+    """
+
+    def __init__(self, store, lease: float = SHARED_FLIGHT_LEASE, poll_interval: float = SHARED_FLIGHT_POLL):
+        super().__init__()
+        self.store = store
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.remote = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]], decode: Optional[Callable] = None) -> Any:
+        return await super().do(key, lambda: self._leased(key, call, decode))
+
+    async def _leased(self, key: Hashable, call: Callable[[], Awaitable[Any]], decode: Optional[Callable]) -> Any:
+        name = "flight:" + ("|".join(map(str, key)) if isinstance(key, tuple) else str(key))
+        asked = time.time()
+        deadline = time.monotonic() + self.lease
+        while True:
+            # Look for a result before the lease: its holder releases it right after publishing
+            blob = await self.store.aget(f"{name}:result")
+            if blob is not None:
+                published = json.loads(blob)
+                if published["at"] >= asked:
+                    self.remote += 1
+                    result = published["result"]
+                    return decode(result) if decode is not None and result is not None else result
+            if await self.store.aadd(f"{name}:lease", b"1", self.lease):
+                try:
+                    result = await call()
+                    await self.store.aset(f"{name}:result", json.dumps({"at": time.time(), "result": result}).encode(), self.lease)
+                    return result
+                finally:
+                    await self.store.adelete(f"{name}:lease")
+            if time.monotonic() > deadline:
+                return await call()
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["remote"] = self.remote
+        return stats
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from engine.tasks import Task, tasks_from_rows
+
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "30"))
+TASK_CACHE_MAX_ENTRIES = int(os.getenv("TASK_CACHE_MAX_ENTRIES", "1024"))
+# How long a list published to the shared store stays there, for revalidation and stale reads
+SHARED_TASK_TTL = float(os.getenv("SHARED_TASK_TTL", "3600"))
+
+
+class TaskCache:
+    """Per-token task list cache with TTL expiry and an LRU size cap.
+
+    Cached lists are never mutated in place: writes replace the entry with a
+    new list, so callers holding an earlier snapshot are unaffected.
+
+    An expired list is kept (until it is evicted or written to) so the next
+    fetch can revalidate it: when the API reports it unchanged (304) or
+    returns an equal list, the cached object stays in place together with
+    everything derived from it, such as search indexes and rendered replies.
+    """
+
+    def __init__(self, ttl: float = TASK_CACHE_TTL, max_entries: int = TASK_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.revalidations = 0
+
+    def get(self, token: str) -> Optional[List[Task]]:
+        """Return the cached task list or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, tasks = entry[0], entry[1]
+            if expires_at < time.monotonic():
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return tasks
+
+    def set(self, token: str, tasks: List[Task], etag: Optional[str] = None) -> List[Task]:
+        """Store a freshly fetched task list and return the list now cached.
+
+        If it equals the list already cached, that list is kept so values
+        derived from it stay valid.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] == tasks:
+                self.revalidations += 1
+                self._store(token, entry[1], etag=etag, derived=entry[2])
+                return entry[1]
+            tasks = list(tasks)
+            self._store(token, tasks, etag=etag)
+            return tasks
+
+    def stale(self, token: str) -> Tuple[Optional[List[Task]], Optional[str]]:
+        """Return the cached list, fresh or expired, and the ETag it was fetched with"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None, None
+            return entry[1], entry[3]
+
+    def revalidate(self, token: str) -> Optional[List[Task]]:
+        """Renew the cached list after the API reported it unchanged; None if it is gone"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            self.revalidations += 1
+            self._store(token, entry[1], etag=entry[3], derived=entry[2])
+            return entry[1]
+
+    def invalidate(self, token: str) -> None:
+        """Drop the cached list for a token"""
+        with self._lock:
+            self._drop(token)
+
+    def add_task(self, token: str, task: Task) -> None:
+        """Write-through for a created task"""
+        with self._lock:
+            entry = self._peek(token)
+            if entry is not None:
+                self._store(token, entry[1] + [task], entry[0])
+
+    def update_task(self, token: str, task_id, **fields) -> None:
+        """Write-through for an updated task; invalidates if the task is not cached"""
+        self.update_tasks(token, [task_id], **fields)
+
+    def update_tasks(self, token: str, task_ids, **fields) -> None:
+        """Write-through for tasks updated with the same fields; invalidates if any is not cached"""
+        with self._lock:
+            entry = self._peek(token)
+            if entry is None:
+                return
+            expires_at, tasks = entry[0], entry[1]
+            ids = {str(task_id) for task_id in task_ids}
+            if sum(1 for t in tasks if str(t.id) in ids) < len(ids):
+                self._drop(token)
+                return
+            updated = [t._replace(**fields) if str(t.id) in ids else t for t in tasks]
+            self._store(token, updated, expires_at)
+
+    def remove_task(self, token: str, task_id) -> None:
+        """Write-through for a deleted task; invalidates if the task is not cached"""
+        self.remove_tasks(token, [task_id])
+
+    def remove_tasks(self, token: str, task_ids) -> None:
+        """Write-through for deleted tasks; invalidates if any is not cached"""
+        with self._lock:
+            entry = self._peek(token)
+            if entry is None:
+                return
+            expires_at, tasks = entry[0], entry[1]
+            ids = {str(task_id) for task_id in task_ids}
+            remaining = [t for t in tasks if str(t.id) not in ids]
+            if len(tasks) - len(remaining) < len(ids):
+                self._drop(token)
+            else:
+                self._store(token, remaining, expires_at)
+
+    def replace_task(self, token: str, task_id, task: Task) -> None:
+        """Swap a task for its new version, e.g. a locally created task for the one the API returned"""
+        with self._lock:
+            entry = self._peek(token)
+            if entry is None:
+                return
+            expires_at, tasks = entry[0], entry[1]
+            old_id, new_id = str(task_id), str(task.id)
+            kept = [t for t in tasks if str(t.id) not in (old_id, new_id)]
+            if len(kept) == len(tasks):
+                self._drop(token)
+            else:
+                self._store(token, kept + [task], expires_at)
+
+    def cached_derived(self, token: str, tasks: List[Task], name: str) -> Any:
+        """Return a value memoized by `derived` for this snapshot, or None"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] is not tasks:
+                return None
+            return entry[2].get(name)
+
+    def derived(self, token: str, tasks: List[Task], name: str, build: Callable[[List[Task]], Any]) -> Any:
+        """Memoize `build(tasks)` on the cache entry holding exactly this snapshot.
+
+        Derived values are dropped whenever the entry is replaced, so they can
+        never outlive the list they were computed from.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] is not tasks:
+                entry = None
+            elif name in entry[2]:
+                return entry[2][name]
+        value = build(tasks)
+        if entry is not None:
+            with self._lock:
+                entry[2][name] = value
+        return value
+
+    async def pull(self, token: str) -> None:
+        """Bring a token's entry up to date with other worker processes; see SharedTaskCache"""
+
+    async def push(self) -> None:
+        """Publish entries written since the last push to other worker processes; see SharedTaskCache"""
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "revalidations": self.revalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _peek(self, token: str) -> Optional[tuple]:
+        entry = self._entries.get(token)
+        if entry is not None and entry[0] < time.monotonic():
+            # A write makes the expired list useless for revalidation
+            self._drop(token)
+            return None
+        return entry
+
+    def _drop(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+    def _store(
+        self,
+        token: str,
+        tasks: List[Task],
+        expires_at: Optional[float] = None,
+        etag: Optional[str] = None,
+        derived: Optional[Dict] = None,
+    ) -> None:
+        # Write-through keeps the original expiry so entries still refresh on schedule.
+        # It passes no ETag: the list no longer matches what the API sent with it.
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl
+        self._entries[token] = (expires_at, tasks, derived if derived is not None else {}, etag)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class SharedTaskCache(TaskCache):
+    """TaskCache whose lists are shared by worker processes through a `SharedStore`.
+
+    Each worker still keeps decoded lists, and everything derived from them,
+    in its own entries. The store holds each token's latest list as JSON,
+    tagged with a version that changes on every write. `pull` compares
+    versions (one small read) and loads the stored list if another worker
+    replaced it; the engine pulls before a command reads or writes a list.
+    Writes are queued, and `push` publishes them after the command. The
+    store is only reached from those two coroutines, never from the
+    synchronous methods, so a store that waits on the network does not
+    block the event loop. When two workers write the same token at the same
+    moment the later publish wins, and the lost write-through is corrected
+    by the next fetch.
+    """
+
+    def __init__(
+        self,
+        store,
+        ttl: float = TASK_CACHE_TTL,
+        max_entries: int = TASK_CACHE_MAX_ENTRIES,
+        shared_ttl: float = SHARED_TASK_TTL,
+    ):
+        super().__init__(ttl, max_entries)
+        self.store = store
+        self.shared_ttl = shared_ttl
+        self._versions: Dict[str, str] = {}
+        # token -> (version, JSON list) to publish, or None to remove the list from the store
+        self._unpublished: Dict[str, Optional[Tuple[str, bytes]]] = {}
+        self._publishing: Dict[str, Optional[Tuple[str, bytes]]] = {}
+        self._push_lock = asyncio.Lock()
+        self.shared_loads = 0
+
+    async def pull(self, token: str) -> None:
+        if self._written_here(token):
+            return
+        version = await self.store.aget(f"tasks:{token}:version")
+        with self._lock:
+            if version is not None and token in self._entries and self._versions.get(token) == version.decode():
+                return
+        blob = await self.store.aget(f"tasks:{token}") if version is not None else None
+        with self._lock:
+            if self._written_here(token):
+                return
+            if blob is None:
+                super()._drop(token)
+                self._versions.pop(token, None)
+                return
+            data = json.loads(blob)
+            tasks, derived = tasks_from_rows(data["tasks"]), None
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] == tasks:
+                tasks, derived = entry[1], entry[2]
+            # Expiry travels as wall-clock time; monotonic clocks differ between processes
+            expires_at = time.monotonic() + data["expires"] - time.time()
+            super()._store(token, tasks, expires_at, data["etag"], derived)
+            self._versions[token] = data["version"]
+            self.shared_loads += 1
+
+    async def push(self) -> None:
+        if not self._unpublished:
+            return
+        # One push at a time, so an older list never lands after a newer one
+        async with self._push_lock:
+            with self._lock:
+                self._publishing, self._unpublished = self._unpublished, {}
+            try:
+                for token, published in self._publishing.items():
+                    if published is None:
+                        await self.store.adelete(f"tasks:{token}:version")
+                        await self.store.adelete(f"tasks:{token}")
+                        continue
+                    version, blob = published
+                    # The list goes first, so a worker that sees the new version also finds the new list
+                    await self.store.aset(f"tasks:{token}", blob, self.shared_ttl)
+                    await self.store.aset(f"tasks:{token}:version", version.encode(), self.shared_ttl)
+            finally:
+                self._publishing = {}
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["shared_loads"] = self.shared_loads
+        return stats
+
+    def _written_here(self, token: str) -> bool:
+        """True while this worker has a write to the token's list not yet in the store, which is then older"""
+        return token in self._unpublished or token in self._publishing
+
+    def _drop(self, token: str) -> None:
+        super()._drop(token)
+        self._versions.pop(token, None)
+        self._unpublished[token] = None
+
+    def _store(
+        self,
+        token: str,
+        tasks: List[Task],
+        expires_at: Optional[float] = None,
+        etag: Optional[str] = None,
+        derived: Optional[Dict] = None,
+    ) -> None:
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl
+        super()._store(token, tasks, expires_at, etag, derived)
+        version = uuid.uuid4().hex
+        blob = {"version": version, "tasks": tasks, "etag": etag, "expires": time.time() + expires_at - time.monotonic()}
+        self._unpublished[token] = (version, json.dumps(blob).encode())
+        self._versions[token] = version
+        if len(self._versions) > 2 * self.max_entries:
+            # Forget versions of entries the LRU cap evicted
+            self._versions = {t: v for t, v in self._versions.items() if t in self._entries}
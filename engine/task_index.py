@@ -0,0 +1,146 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from engine.tasks import Task
+
+WORD = re.compile(r"\w+")
+# Two best matches closer than this are reported as ambiguous
+AMBIGUITY_MARGIN = 0.05
+# Fuzzy matches below this score are ignored
+MIN_SCORE = 0.2
+# Lowest score of a text containing the query; fuzzy matches always score below it
+SUBSTRING_SCORE = 0.5
+# Fuzzy matches offered as "did you mean" suggestions
+SUGGESTIONS = 3
+# Rarest query trigrams used to collect fuzzy candidates
+FUZZY_PROBE_TRIGRAMS = 6
+# Candidates sharing the most probe trigrams that get a full similarity score
+FUZZY_SHORTLIST = 50
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop surrounding quotes and collapse whitespace"""
+    return " ".join(text.lower().strip().strip('"\'').split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TaskIndex:
+    """Searchable view of one task list snapshot.
+
+    Texts are normalized once at build time. A word index answers whole-word
+    queries, a trigram index answers partial-word substring queries and
+    supplies candidates for typo-tolerant matching.
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks = tasks
+        self.texts = [normalize(t.text) for t in tasks]
+        self.lengths = [len(text) for text in self.texts]
+        self.words: Dict[str, List[int]] = defaultdict(list)
+        self.grams: Dict[str, List[int]] = defaultdict(list)
+        self.gram_sets: List[Set[str]] = []
+        for i, text in enumerate(self.texts):
+            for word in set(WORD.findall(text)):
+                self.words[word].append(i)
+            grams = trigrams(text)
+            self.gram_sets.append(grams)
+            for gram in grams:
+                self.grams[gram].append(i)
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, Task]]:
+        """Return up to `limit` (score, task) pairs, best first"""
+        query = normalize(query)
+        if not query:
+            return []
+        found = self._substring_matches(query)
+        if found:
+            # Substring score only depends on text length, so the shortest texts win
+            best = heapq.nsmallest(limit, found, key=lambda i: (self.lengths[i], i))
+            return [(self._substring_score(query, i), self.tasks[i]) for i in best]
+        return self._fuzzy_matches(query, limit)
+
+    def best(self, query: str) -> Tuple[Optional[Task], List[Task]]:
+        """Return (best task, other near-equal matches); the list is empty when unambiguous.
+
+        Only exact and containing matches count: a typo-level match is too
+        weak to act on, see `suggest`.
+        """
+        matches = self.search(query)
+        if not matches or matches[0][0] < SUBSTRING_SCORE:
+            return None, []
+        top_score, top = matches[0]
+        if top_score == 1.0:
+            # An exact match only competes with other exact matches
+            return top, [task for score, task in matches[1:] if score == 1.0]
+        rivals = [task for score, task in matches[1:] if top_score - score < AMBIGUITY_MARGIN]
+        return top, rivals
+
+    def suggest(self, query: str, limit: int = SUGGESTIONS) -> List[Task]:
+        """Typo-tolerant matches for a query no task contains, best first"""
+        return [task for score, task in self.search(query, limit) if score < SUBSTRING_SCORE]
+
+    def _substring_matches(self, query: str) -> Set[int]:
+        # Whole-word query: intersect word postings, smallest first
+        postings = [self.words.get(word) for word in WORD.findall(query)]
+        if postings and all(postings):
+            found = self._intersect(postings, query)
+            if found:
+                return found
+
+        return self._containing(query)
+
+    def containing(self, query: str) -> List[Task]:
+        """Every task whose text contains `query`, in list order"""
+        query = normalize(query)
+        if not query:
+            return []
+        return [self.tasks[i] for i in sorted(self._containing(query))]
+
+    def _containing(self, query: str) -> Set[int]:
+        if len(query) < 3:
+            return {i for i, text in enumerate(self.texts) if query in text}
+
+        # Partial-word query: a containing text has every trigram of the query
+        postings = [self.grams.get(query[i:i + 3]) for i in range(len(query) - 2)]
+        if all(postings):
+            return self._intersect(postings, query)
+        return set()
+
+    def _intersect(self, postings: List[List[int]], query: str) -> Set[int]:
+        postings = sorted(postings, key=len)
+        found = set(postings[0])
+        for posting in postings[1:]:
+            found.intersection_update(posting)
+            if not found:
+                break
+        return {i for i in found if query in self.texts[i]}
+
+    def _substring_score(self, query: str, i: int) -> float:
+        if self.texts[i] == query:
+            return 1.0
+        return SUBSTRING_SCORE + 0.49 * len(query) / self.lengths[i]
+
+    def _fuzzy_matches(self, query: str, limit: int) -> List[Tuple[float, Task]]:
+        """Typo-tolerant matches by trigram Dice coefficient, always scored below substring hits"""
+        query_grams = trigrams(query)
+        probes = sorted(
+            (posting for posting in (self.grams.get(g) for g in query_grams) if posting),
+            key=len,
+        )
+        hits: Counter = Counter()
+        for posting in probes[:FUZZY_PROBE_TRIGRAMS]:
+            hits.update(posting)
+        scored = []
+        for i, _ in hits.most_common(FUZZY_SHORTLIST):
+            common = len(query_grams & self.gram_sets[i])
+            score = 0.49 * 2 * common / (len(query_grams) + len(self.gram_sets[i]))
+            if score >= MIN_SCORE:
+                scored.append((score, i))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(score, self.tasks[i]) for score, i in scored[:limit]]
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+# Seconds between background refreshes of each active token's task list; 0 turns syncing off
+TASK_SYNC_INTERVAL = float(os.getenv("TASK_SYNC_INTERVAL", "0"))
+# Tokens with no read for this many seconds are no longer synced
+TASK_SYNC_IDLE = float(os.getenv("TASK_SYNC_IDLE", "600"))
+# Token lists refreshed at once in one sync round
+TASK_SYNC_CONCURRENCY = int(os.getenv("TASK_SYNC_CONCURRENCY", "8"))
+
+
+class TaskSync:
+    """Keeps the cached task lists of recently active tokens fresh in the background.
+
+    Every `interval` seconds `refresh(token)` is run for each token read in
+    the last `idle` seconds; it refetches the list into the task cache and
+    returns whether it changed. The refetch is conditional (If-None-Match),
+    so an unchanged list costs a 304 with no body. With `interval` below
+    TASK_CACHE_TTL the cached list never expires while its token is active:
+    reads are answered from it, at most `interval` seconds behind the API,
+    instead of waiting for a refetch. If syncing fails the list expires as
+    usual and the next read fetches it.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str], Awaitable[bool]],
+        interval: float = TASK_SYNC_INTERVAL,
+        idle: float = TASK_SYNC_IDLE,
+        concurrency: int = TASK_SYNC_CONCURRENCY,
+    ):
+        self.refresh = refresh
+        self.interval = interval
+        self.idle = idle
+        self.concurrency = concurrency
+        # token -> when it was last read (monotonic)
+        self.active: Dict[str, float] = {}
+        self.unchanged = 0
+        self.changed = 0
+        self.failed = 0
+        self._worker: Optional[asyncio.Task] = None
+
+    def touch(self, token: str) -> None:
+        """Record a read, so the token's list is kept in sync"""
+        self.active[token] = time.monotonic()
+
+    def start(self) -> None:
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def sync_once(self) -> None:
+        """Refresh every active token's list, dropping tokens that went idle"""
+        cutoff = time.monotonic() - self.idle
+        for token in [t for t, seen in self.active.items() if seen < cutoff]:
+            del self.active[token]
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def sync(token: str) -> None:
+            async with limit:
+                try:
+                    changed = await self.refresh(token)
+                except Exception:
+                    self.failed += 1
+                    return
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+
+        await asyncio.gather(*(sync(t) for t in list(self.active)))
+
+    def stats(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "active_tokens": len(self.active),
+            "unchanged": self.unchanged,
+            "changed": self.changed,
+            "failed": self.failed,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sync_once()
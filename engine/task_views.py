@@ -0,0 +1,92 @@
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from engine.tasks import Task
+
+LIST_INTENTS = {"list_tasks", "list_incomplete", "list_complete"}
+PAGE_INTENTS = {"list_page", "list_next"}
+LIST_LABELS = {
+    "list_tasks": "task(s)",
+    "list_incomplete": "incomplete task(s)",
+    "list_complete": "completed task(s)",
+}
+EMPTY_LIST_REPLIES = {
+    "list_tasks": "You have no tasks.",
+    "list_incomplete": "You have no incomplete tasks. Great job!",
+    "list_complete": "You have no completed tasks yet.",
+}
+# Words accepted after "page 3 of ..." / "next 20 ..." and the list they select
+LIST_FILTERS = {
+    "all": "list_tasks",
+    "incomplete": "list_incomplete",
+    "pending": "list_incomplete",
+    "unfinished": "list_incomplete",
+    "complete": "list_complete",
+    "completed": "list_complete",
+    "done": "list_complete",
+    "finished": "list_complete",
+}
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+def partition_tasks(tasks: List[Task]) -> Dict[str, List[Task]]:
+    """Split a snapshot by completion status in one pass, keyed by list intent"""
+    incomplete, complete = [], []
+    for t in tasks:
+        (complete if t.complete else incomplete).append(t)
+    return {"list_tasks": tasks, "list_incomplete": incomplete, "list_complete": complete}
+
+
+def format_task_line(intent: str, position: int, task: Task) -> str:
+    if intent == "list_tasks":
+        return f"{position}. {'✓' if task.complete else '○'} {task.text}"
+    return f"{position}. {task.text}"
+
+
+def render_list(intent: str, items: List[Task]) -> Iterator[str]:
+    """Yield the reply for a list intent piece by piece: header, then one line per task"""
+    if not items:
+        yield EMPTY_LIST_REPLIES[intent]
+        return
+
+    yield f"You have {len(items)} {LIST_LABELS[intent]}:\n\n"
+    for i, t in enumerate(items):
+        yield ("\n" if i else "") + format_task_line(intent, i + 1, t)
+
+
+def render_page(intent: str, items: List[Task], start: int, count: int) -> Iterator[str]:
+    """Yield one page of a list; line numbers match the full listing"""
+    if not items:
+        yield EMPTY_LIST_REPLIES[intent]
+        return
+    if start >= len(items):
+        yield f"No more {LIST_LABELS[intent]}. You have {len(items)} in total."
+        return
+
+    page = items[start:start + count]
+    end = start + len(page)
+    pages = -(-len(items) // count)
+    yield f"Page {start // count + 1} of {pages}: {LIST_LABELS[intent]} {start + 1}-{end} of {len(items)}:\n\n"
+    for i, t in enumerate(page):
+        yield ("\n" if i else "") + format_task_line(intent, start + i + 1, t)
+    if end < len(items):
+        yield "\n\nSay 'show next' for more."
+
+
+def resolve_page(intent: str, params: Optional[Tuple], cursor: Optional[Dict]) -> Tuple[str, int, int]:
+    """Turn a page intent plus the session cursor into (list intent, start offset, page size)"""
+    number, word = (tuple(params or ()) + (None, None))[:2]
+    list_intent = LIST_FILTERS.get(word) if word else None
+
+    if intent == "list_page":
+        list_intent = list_intent or (cursor or {}).get("intent", "list_tasks")
+        size = (cursor or {}).get("size", PAGE_SIZE)
+        return list_intent, (max(int(number), 1) - 1) * size, size
+
+    # list_next: continue the cursor when it is for the same list
+    same_list = cursor is not None and list_intent in (None, cursor["intent"])
+    list_intent = list_intent or (cursor["intent"] if cursor else "list_tasks")
+    size = min(int(number), MAX_PAGE_SIZE) if number else (cursor["size"] if same_list else PAGE_SIZE)
+    start = cursor["offset"] if same_list else 0
+    return list_intent, start, max(size, 1)
@@ -0,0 +1,47 @@
+from typing import Any, Iterable, List, NamedTuple
+
+import msgspec
+
+
+class Task(NamedTuple):
+    """The fields of a One List API item the chat engine uses.
+
+    A tuple per task instead of the API's dict with timestamps: a fraction
+    of the memory, compared and hashed at C speed, and serialized to JSON
+    as a compact `[id, text, complete]` row.
+    """
+
+    id: Any
+    text: str
+    complete: bool
+
+
+class _Item(msgspec.Struct, gc=False):
+    """An API item as decoded: only the Task fields, the rest (timestamps) is skipped without building a dict"""
+
+    id: Any
+    text: Any = ""
+    complete: Any = False
+
+
+_decode_items = msgspec.json.Decoder(List[_Item]).decode
+_decode_item = msgspec.json.Decoder(_Item).decode
+
+# Builds a Task without NamedTuple's Python-level __new__, which dominates decoding large lists
+_make = tuple.__new__
+
+
+def decode_tasks(body: bytes) -> List[Task]:
+    """Tasks from a GET /items response body"""
+    return [_make(Task, (item.id, item.text, item.complete)) for item in _decode_items(body)]
+
+
+def decode_task(body: bytes) -> Task:
+    """Task from a single-item response body (GET/POST /items)"""
+    item = _decode_item(body)
+    return _make(Task, (item.id, item.text, item.complete))
+
+
+def tasks_from_rows(rows: Iterable) -> List[Task]:
+    """Tasks back from their JSON form (`[id, text, complete]` rows)"""
+    return [_make(Task, row) for row in rows]
@@ -1,6 +1,73 @@
 import streamlit as st
-import requests
+import json
 import os
+import sys
+import uuid
+from typing import Iterator
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+# Chat history paging is shared with the Streamlit-only app through the `engine` package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.chat_history import ChatHistory, open_history_store  # noqa: E402
+
+
+BACKEND_WS_URL = os.getenv("BACKEND_WS_URL", "ws://127.0.0.1:8000/ws/chat")
+# Seconds to wait for each part of a reply
+REPLY_TIMEOUT = 60
+
+
+@st.cache_resource
+def get_history_store():
+    """Where every user session pages out its older messages"""
+    return open_history_store()
+
+
+def idempotency_key(prompt: str) -> str:
+    """Key sent with a prompt; the same prompt sent again before its reply was shown reuses it.
+
+    That covers a double submit, a rerun that interrupted the previous one
+    mid-reply, and the resend after a reconnect: the backend replays the
+    first reply instead of adding the task twice.
+    """
+    pending = st.session_state.get("pending")
+    if pending is None or pending[0] != prompt:
+        pending = st.session_state.pending = (prompt, uuid.uuid4().hex)
+    return pending[1]
+
+
+def ask_backend(prompt: str) -> Iterator[str]:
+    """Send a prompt over this session's /ws/chat connection and yield the reply as it arrives.
+
+    The connection is kept in session state across reruns; if the backend
+    closed it (idle timeout, restart) a new one is opened before sending.
+    """
+    payload = json.dumps(
+        {"message": prompt, "session_id": st.session_state.session_id, "idempotency_key": idempotency_key(prompt)}
+    )
+    socket = st.session_state.get("socket")
+    if socket is not None:
+        try:
+            socket.send(payload)
+        except ConnectionClosed:
+            socket = None
+    if socket is None:
+        # Outlives this rerun, so it is not opened in a `with` block
+        socket = st.session_state.socket = connect(BACKEND_WS_URL, legacy=True)
+        socket.send(payload)
+    try:
+        while True:
+            frame = json.loads(socket.recv(timeout=REPLY_TIMEOUT))
+            if frame["text"]:
+                yield frame["text"]
+            if frame["done"]:
+                return
+    except BaseException:
+        # The rest of this reply may still arrive; start the next prompt on a clean connection
+        socket.close()
+        st.session_state.socket = None
+        raise
 
 # Page configuration
 st.set_page_config(
@@ -10,8 +77,13 @@ st.set_page_config(
 )
 
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if "session_id" not in st.session_state:
+    # Lets the backend keep per-session state such as "show next" cursors
+    st.session_state.session_id = uuid.uuid4().hex
+if "history" not in st.session_state:
+    # Only the latest messages stay in memory; older ones are paged out and rendered on request
+    st.session_state.history = ChatHistory(get_history_store(), st.session_state.session_id)
+history = st.session_state.history
 
 # Header
 st.title("✓ To-Do Chat Assistant")
@@ -32,11 +104,14 @@ with st.sidebar:
     """)
     
     if st.button("Clear Chat"):
-        st.session_state.messages = []
+        history.clear()
         st.rerun()
 
 # Display chat messages
-for message in st.session_state.messages:
+if history.has_earlier() and st.button("Load earlier messages"):
+    history.show_earlier()
+    st.rerun()
+for message in history.visible():
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
@@ -44,34 +119,22 @@ for message in st.session_state.messages:
 if prompt := st.chat_input("Type your message..."):
     
     # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.show_latest()
+    history.append("user", prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
     
     # Get response from backend
     with st.chat_message("assistant"):
         try:
-            # Call the chat endpoint from main.py
-            response = requests.post(
-                "http://127.0.0.1:8000/chat",
-                json={
-                    "message": prompt
-                }
-            )
-            response.raise_for_status()
-            assistant_response = response.json()["response"]
+            # Stream the reply so long task lists render as they arrive
+            assistant_response = st.write_stream(ask_backend(prompt))
             
-            # Add and display assistant message
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": assistant_response
-            })
-            st.markdown(assistant_response)
+            # Add assistant message
+            history.append("assistant", assistant_response)
+            st.session_state.pending = None
             
         except Exception as e:
             error_msg = f"Error: {str(e)}"
             st.error(error_msg)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": error_msg
-            })
\ No newline at end of file
+            history.append("assistant", error_msg)
\ No newline at end of file
@@ -1,5 +1,26 @@
+import os
+import sys
+import uuid
+
 import streamlit as st
-from nlp_logic import handle_chat
+
+# The shared chat engine lives in the `engine` package at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp_logic import create_session, handle_chat  # noqa: E402
+from engine.chat_history import ChatHistory, open_history_store  # noqa: E402
+
+
+@st.cache_resource
+def get_http_session():
+    """One pooled One List API session shared by every rerun and user session"""
+    return create_session()
+
+
+@st.cache_resource
+def get_history_store():
+    """Where every user session pages out its older messages"""
+    return open_history_store()
 
 # Page configuration
 st.set_page_config(
@@ -9,8 +30,12 @@ st.set_page_config(
 )
 
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "history" not in st.session_state:
+    # Only the latest messages stay in memory; older ones are paged out and rendered on request
+    st.session_state.history = ChatHistory(get_history_store(), st.session_state.session_id)
+history = st.session_state.history
 
 # Header
 st.title("✓ To-Do Chat Assistant")
@@ -31,20 +56,24 @@ with st.sidebar:
     """)
     
     if st.button("Clear Chat"):
-        st.session_state.messages = []
+        history.clear()
         st.rerun()
 
 # Display chat messages
-for message in st.session_state.messages:
+if history.has_earlier() and st.button("Load earlier messages"):
+    history.show_earlier()
+    st.rerun()
+for message in history.visible():
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 if prompt := st.chat_input("Type your message..."):
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.show_latest()
+    history.append("user", prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        response = handle_chat(prompt)
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        response = handle_chat(prompt, session=get_http_session(), session_id=st.session_state.session_id)
+        history.append("assistant", response)
         st.markdown(response)
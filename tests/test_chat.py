@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from stub_api import start_stub  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+from engine.chat import ChatEngine  # noqa: E402
+from engine.circuit_breaker import CircuitOpenError  # noqa: E402
+from engine.task_cache import TaskCache  # noqa: E402
+
+TOKEN = "chat-test"
+
+
+class CircuitOpen:
+    """Client for an API whose breakers are all open"""
+
+    async def list_items(self, token):
+        raise CircuitOpenError("GET /items", 5)
+
+    async def list_items_if_changed(self, token, etag):
+        raise CircuitOpenError("GET /items", 5)
+
+    async def get_item(self, token, item_id):
+        raise CircuitOpenError("GET /items/{id}", 5)
+
+
+def test_view_task_without_session_numbers_the_stale_list_while_circuit_is_open():
+    server, url, store = start_stub(latency=0.0)
+    store.seed(TOKEN, 3)
+
+    async def scenario():
+        engine = ChatEngine(OneListClient(url), task_cache=TaskCache(ttl=0))
+        await engine.handle("show all tasks", TOKEN)
+        engine.client = CircuitOpen()
+
+        reply = await engine.handle("task 2", TOKEN)
+        assert reply.success, reply.response
+        assert "task 1 buy groceries" in reply.response
+        assert "last list I fetched" in reply.response
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from engine.circuit_breaker import CircuitBreaker, CircuitOpenError  # noqa: E402
+
+
+def tripped(reset_timeout: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker("GET /items", failure_threshold=2, reset_timeout=reset_timeout)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures_and_refuses_calls():
+    breaker = CircuitBreaker("GET /items", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker = tripped(reset_timeout=30)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = tripped()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+
+
+def test_abandoned_probe_lets_the_next_call_probe():
+    breaker = tripped()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_abandoned()
+    assert breaker.before_call() is True
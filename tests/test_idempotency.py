@@ -0,0 +1,91 @@
+import asyncio
+import os
+import socket
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from stub_api import start_stub  # noqa: E402
+from backend import main  # noqa: E402
+from backend.idempotency import IdempotencyStore  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+
+TOKEN = "idempotency-test"
+
+
+def closed_port_url() -> str:
+    """URL of a local port nothing listens on, so every call fails to connect"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+async def send(message: str, key: str):
+    return await main.process_message(message, TOKEN, idempotency_key=key)
+
+
+def use_client(client: OneListClient) -> None:
+    main.engine.client = client
+    main.engine.task_cache.invalidate(TOKEN)
+
+
+def setup_function():
+    main.idempotency = IdempotencyStore()
+
+
+def test_retry_after_connect_error_runs_the_write():
+    server, url, store = start_stub(latency=0.0)
+
+    async def scenario():
+        use_client(OneListClient(closed_port_url()))
+        first = await send("add a task to buy milk", "k1")
+        assert not first.success
+
+        use_client(OneListClient(url))
+        retry = await send("add a task to buy milk", "k1")
+        assert retry.success
+        assert [t["text"] for t in store.tasks(TOKEN).values()] == ["buy milk"]
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+
+def test_retry_after_not_found_runs_the_write():
+    server, url, store = start_stub(latency=0.0)
+
+    async def scenario():
+        use_client(OneListClient(url))
+        assert not (await send("delete buy bread", "k2")).success
+
+        assert (await send("add a task to buy bread", "k3")).success
+        assert (await send("delete buy bread", "k2")).success
+        assert store.tasks(TOKEN) == {}
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+
+def test_retry_after_read_timeout_is_not_run_again():
+    server, url, store = start_stub(latency=0.3)
+
+    async def scenario():
+        use_client(OneListClient(url, read_timeout=0.1))
+        first = await send("add a task to buy eggs", "k4")
+        assert not first.success
+
+        use_client(OneListClient(url))
+        retry = await send("add a task to buy eggs", "k4")
+        assert retry == first
+        # The timed-out add still reached the API, and the retry did not add it again
+        assert store.calls_by_endpoint["POST /items"] == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
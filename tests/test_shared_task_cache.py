@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.shared_state import SQLiteStore  # noqa: E402
+from engine.task_cache import SharedTaskCache  # noqa: E402
+from engine.tasks import Task  # noqa: E402
+
+TOKEN = "shared-cache-test"
+TASKS = [Task(1, "buy milk", False), Task(2, "pay rent", True)]
+
+
+def workers(tmp_path):
+    """Two caches sharing one store file, as two worker processes would"""
+    path = str(tmp_path / "shared.sqlite3")
+    return SharedTaskCache(SQLiteStore(path)), SharedTaskCache(SQLiteStore(path))
+
+
+def test_write_is_seen_by_another_worker_after_push_and_pull(tmp_path):
+    a, b = workers(tmp_path)
+
+    async def scenario():
+        a.set(TOKEN, TASKS)
+        await b.pull(TOKEN)
+        assert b.get(TOKEN) is None
+
+        await a.push()
+        await b.pull(TOKEN)
+        assert b.get(TOKEN) == TASKS
+        assert b.stats()["shared_loads"] == 1
+
+        a.update_task(TOKEN, 1, complete=True)
+        await a.push()
+        await b.pull(TOKEN)
+        assert b.get(TOKEN)[0].complete
+
+        a.invalidate(TOKEN)
+        await a.push()
+        await b.pull(TOKEN)
+        assert b.get(TOKEN) is None
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_version_keeps_derived_values(tmp_path):
+    a, b = workers(tmp_path)
+
+    async def scenario():
+        a.set(TOKEN, TASKS)
+        await a.push()
+        await b.pull(TOKEN)
+        tasks = b.get(TOKEN)
+        rendered = b.derived(TOKEN, tasks, "render", lambda tasks: object())
+
+        await b.pull(TOKEN)
+        assert b.get(TOKEN) is tasks
+        assert b.cached_derived(TOKEN, tasks, "render") is rendered
+        assert b.stats()["shared_loads"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_pull_does_not_overwrite_a_write_not_pushed_yet(tmp_path):
+    a, b = workers(tmp_path)
+
+    async def scenario():
+        a.set(TOKEN, TASKS)
+        await a.push()
+        b.set(TOKEN, TASKS[:1])
+        await b.pull(TOKEN)
+        assert b.get(TOKEN) == TASKS[:1]
+
+    asyncio.run(scenario())
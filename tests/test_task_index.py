@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.task_index import TaskIndex  # noqa: E402
+from engine.tasks import Task  # noqa: E402
+
+TASKS = [Task(i, text, False) for i, text in enumerate(["buy milk", "buy milk and eggs", "walk the dog", "pay rent"])]
+
+
+def test_exact_match_is_not_ambiguous_with_longer_tasks_containing_it():
+    task, rivals = TaskIndex(TASKS).best("buy milk")
+    assert task.text == "buy milk"
+    assert rivals == []
+
+
+def test_typo_level_match_is_only_a_suggestion():
+    index = TaskIndex(TASKS)
+    assert index.best("rent car") == (None, [])
+    assert [t.text for t in index.suggest("rent car")] == ["pay rent"]
+
+
+def test_containing_match_has_no_suggestions():
+    index = TaskIndex(TASKS)
+    assert index.best("rent")[0].text == "pay rent"
+    assert index.suggest("rent") == []
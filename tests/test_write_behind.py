@@ -0,0 +1,186 @@
+import asyncio
+import os
+import socket
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pytest  # noqa: E402
+
+from stub_api import start_stub  # noqa: E402
+from backend import main  # noqa: E402
+from backend.upstream import OneListClient  # noqa: E402
+from backend.write_behind import WriteBehindStore, WriteJournal  # noqa: E402
+from engine.chat import ChatEngine  # noqa: E402
+
+TOKEN = "write-behind-test"
+SESSION = "session"
+
+
+@pytest.fixture
+def stub():
+    server, url, store = start_stub(latency=0.0)
+    yield url, store
+    server.shutdown()
+
+
+@pytest.fixture
+def make_engine(monkeypatch, tmp_path):
+    """An engine in write-behind mode wired like backend.main, against the given client"""
+
+    def make(client):
+        write_behind = WriteBehindStore(
+            client, WriteJournal(str(tmp_path / "journal.sqlite3")), main.on_write_synced, main.on_write_dropped
+        )
+        engine = ChatEngine(client, write_behind=write_behind)
+        monkeypatch.setattr(main, "write_behind", write_behind)
+        monkeypatch.setattr(main, "engine", engine)
+        return engine
+
+    return make
+
+
+def closed_port_url() -> str:
+    """URL of a local port nothing listens on, so every call fails to connect"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+async def synced(engine: ChatEngine) -> None:
+    """Wait until every journaled write has been sent upstream"""
+    while engine.write_behind.stats()["pending"]:
+        await asyncio.sleep(0.01)
+
+
+def test_number_shown_before_add_synced_deletes_the_task(stub, make_engine):
+    url, store = stub
+
+    async def scenario():
+        engine = make_engine(OneListClient(url))
+        await engine.handle("show all tasks", TOKEN, session_id=SESSION)
+        await engine.handle("add a task to buy milk", TOKEN, session_id=SESSION)
+        # Numbered while the task still has its local id
+        await engine.handle("show all tasks", TOKEN, session_id=SESSION)
+        await synced(engine)
+
+        reply = await engine.handle("delete 1", TOKEN, session_id=SESSION)
+        assert reply.success, reply.response
+        await synced(engine)
+        assert store.tasks(TOKEN) == {}
+        await engine.write_behind.stop()
+
+    asyncio.run(scenario())
+
+
+def test_number_shown_before_add_synced_completes_the_task_with_a_cold_cache(stub, make_engine):
+    url, store = stub
+
+    async def scenario():
+        engine = make_engine(OneListClient(url))
+        await engine.handle("add a task to buy milk", TOKEN, session_id=SESSION)
+        await engine.handle("show all tasks", TOKEN, session_id=SESSION)
+        await synced(engine)
+        engine.task_cache.invalidate(TOKEN)
+
+        reply = await engine.handle("complete 1", TOKEN, session_id=SESSION)
+        assert reply.success, reply.response
+        await synced(engine)
+        assert engine.write_behind.stats()["dropped"] == 0
+        assert [t["complete"] for t in store.tasks(TOKEN).values()] == [True]
+        await engine.write_behind.stop()
+
+    asyncio.run(scenario())
+
+
+class HeldCreate:
+    """Client whose create_item reaches the API at once but does not return until `release` is set"""
+
+    def __init__(self, client: OneListClient):
+        self.client = client
+        self.release = asyncio.Event()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def create_item(self, token, text):
+        task = await self.client.create_item(token, text)
+        await self.release.wait()
+        return task
+
+
+def test_list_fetched_while_add_is_in_flight_shows_the_task_once(stub, make_engine):
+    url, store = stub
+
+    async def scenario():
+        client = HeldCreate(OneListClient(url))
+        engine = make_engine(client)
+        await engine.handle("add a task to buy milk", TOKEN)
+        while not store.tasks(TOKEN):
+            await asyncio.sleep(0.01)
+
+        listed = await engine.handle("show all tasks", TOKEN)
+        assert listed.response.count("buy milk") == 1, listed.response
+        deleted = await engine.handle("delete buy milk", TOKEN)
+        assert deleted.success, deleted.response
+
+        client.release.set()
+        await synced(engine)
+        assert store.tasks(TOKEN) == {}
+        await engine.write_behind.stop()
+
+    asyncio.run(scenario())
+
+
+def test_journaled_writes_are_replayed_after_a_restart(stub, tmp_path):
+    url, store = stub
+    path = str(tmp_path / "journal.sqlite3")
+
+    async def scenario():
+        # The API is unreachable: the writes stay in the journal
+        offline = WriteBehindStore(OneListClient(closed_port_url()), WriteJournal(path))
+        task = offline.add(TOKEN, "buy milk")
+        offline.complete(TOKEN, task.id)
+        offline.add(TOKEN, "buy bread")
+        await offline.stop()
+        assert store.tasks(TOKEN) == {}
+
+        restarted = WriteBehindStore(OneListClient(url), WriteJournal(path))
+        restarted.start()
+        assert restarted.stats()["pending"] == 3
+        while restarted.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        assert [(t["text"], t["complete"]) for t in store.tasks(TOKEN).values()] == [
+            ("buy milk", True),
+            ("buy bread", False),
+        ]
+        assert restarted.journal.load() == []
+        await restarted.stop()
+
+    asyncio.run(scenario())
+
+
+def test_writes_queued_on_a_local_id_go_to_the_real_task(stub, make_engine):
+    url, store = stub
+
+    async def scenario():
+        client = HeldCreate(OneListClient(url))
+        engine = make_engine(client)
+        await engine.handle("show all tasks", TOKEN)
+        await engine.handle("add a task to buy milk", TOKEN)
+        # Queued behind the add, against its local id
+        completed = await engine.handle("mark buy milk as done", TOKEN)
+        assert completed.success, completed.response
+
+        client.release.set()
+        await synced(engine)
+        real_id = next(iter(store.tasks(TOKEN)))
+        assert store.tasks(TOKEN)[real_id]["complete"]
+        # The cached list has the real task with the queued write applied
+        cached = engine.task_cache.get(TOKEN)
+        assert [(str(t.id), t.complete) for t in cached] == [(str(real_id), True)]
+        await engine.write_behind.stop()
+
+    asyncio.run(scenario())